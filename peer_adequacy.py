@@ -0,0 +1,289 @@
+# Adequacy calculations for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Calculate actual resources, adequacy targets, funding gaps,
+#           adequacy levels, and adequate, actual, and gap position counts
+#           (Step 8 of the data cleaning notebook) in one place, and check the
+#           results against the published numbers.
+#
+# Usage:
+#
+#   python peer_adequacy.py --check            compare with the saved fixture
+#   python peer_adequacy.py --write-fixture    save a new fixture from app_data_wide.parquet
+#
+# NOTE on the State of Illinois row.
+#
+# The statewide row (RCDTS 6500000008000) does not use its own totals for gaps.
+# Its funding gap, funding gap per school, and every position gap are the sum
+# of the negative gaps (i.e. the total shortfall) of all other districts.
+#
+# NOTE on missing values and zeros.
+#
+# - Districts without a funding gap (missing EBF data) are dropped, and then
+#   districts without a funding gap per school (missing school count).
+# - Core and Specialist Teacher gaps that are missing (missing EIS data) count
+#   as 0. Other missing position gaps stay missing.
+# - Per student values are missing when Total ASE is 0 or missing.
+# - Per school values divide by the school count as is, so a school count of
+#   0 gives +/- infinity. The State of Illinois row has no school count, which
+#   is why its position gaps per school are -infinity in the published data.
+#
+# NOTE on the fixture.
+#
+# fixtures/adequacy_golden.parquet holds the inputs and results for every
+# district as published in app_data_wide.parquet when it was written. After
+# changing a formula, `--check` must still pass unless the published numbers
+# are meant to change. The published Adequacy Funding Gap is actual minus
+# target (and the total shortfall on the State of Illinois row), not EBF's own
+# gap, so the fixture rebuilds EBF's gap from the gap per student times Total
+# ASE. The fixture starts from the adequate and actual totals, so
+# position_counts and cases the published data doesn't have (e.g. a Total ASE
+# of 0) are checked by hand-computed rows in tests/test_peer_adequacy.py
+# (`python -m pytest`).
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from peer_data import WIDE_PARQUET, STATE_RCDTS
+
+
+GOLDEN_FIXTURE = os.path.join("fixtures", "adequacy_golden.parquet")
+
+FUNDING_INPUTS = [
+    "Total ASE",
+    "School Count",
+    "EBF Base Calc Final Resources",
+    "EBF Base Calc Final Adequacy Target",
+    "EBF Base Calc Final Adequacy Target Per Student",
+    "EBF Base Calc Adequacy Funding Gap",
+]
+
+# Positions: (adequate column, EBF inputs added together,
+#             actual column, IRC or EIS inputs added together,
+#             gap column, gap per school column, missing gaps count as 0)
+
+POSITIONS = [
+    ("Adequate Core and Specialist Teachers",
+     ["EBF Core Teachers Core Investments", "EBF Core Teacher Additional Investments", "EBF Specialist Teachers Core Investments",
+      "EBF Low Income Extended Day Teacher Additional Investments", "EBF Low Income Summer School Teacher Additional Investments"],
+     "Actual Core and Specialist Teachers Count (EIS)", ["EIS Teacher", "EIS Career and Technical Educator (CTE)"],
+     "Core and Specialist Teachers Gap (EIS)", "Core and Specialist Teachers Gap Per School", True),
+    ("Adequate Special Education Teachers", ["EBF Special Ed Teacher Additional Investments"],
+     "Actual Special Education Teachers Count (EIS)", ["EIS Special Education Teacher"],
+     "Special Education Teachers Gap (EIS)", "Special Education Teachers Gap Per School", False),
+    ("Adequate Counselors", ["EBF School Counselors Core Investments"],
+     "Actual Counselors Count (IRC)", ["IRC School Counselor FTE"],
+     "Counselors Gap (IRC)", "Counselors Gap Per School", False),
+    ("Adequate Nurses", ["EBF School Nurses Core Investments"],
+     "Actual Nurses Count (IRC)", ["IRC School Nurse FTE"],
+     "Nurses Gap (IRC)", "Nurses Gap Per School", False),
+    ("Adequate Psychologists", ["EBF Special Ed School Psychologist Additional Investments"],
+     "Actual Psychologists Count (IRC)", ["IRC School Psychologist FTE"],
+     "Psychologists Gap (IRC)", "Psychologists Gap Per School", False),
+    ("Adequate Principals", ["EBF Principals Core Investments"],
+     "Actual Principals Count (EIS)", ["EIS Principal"],
+     "Principals Gap (EIS)", "Principals Gap Per School", False),
+    ("Adequate Assistant Principals", ["EBF Assistant Principals Core Investments"],
+     "Actual Assistant Principals Count (EIS)", ["EIS Assistant Principal"],
+     "Assistant Principals Gap (EIS)", "Assistant Principals Gap Per School", False),
+    ("Adequate EL Teachers",
+     ["EBF English Learner Intervention Teacher Additional Investments", "EBF English Learner Extended Day Teacher Additional Investments",
+      "EBF English Learner Summer School Teacher Additional Investments"],
+     "Actual EL Teachers (EIS)", ["EIS English as a Second Language Teacher"],
+     "EL Teachers Gap (EIS)", "EL Teachers Gap Per School", False),
+]
+
+# The IRC teacher count includes special education teachers, so its gap is
+# measured against both adequate teacher counts. It is not published.
+
+IRC_TEACHERS = ("Actual Core and Specialist Teachers Count (IRC)", "IRC Teacher FTE", "Core and Specialist Teachers Gap (IRC)")
+
+
+# Calculations
+
+def _values(df, col):
+    """Column as a float array"""
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+
+def _sum_inputs(df, cols):
+    """Add input columns; missing in any input gives missing, as in pandas addition"""
+    return np.sum([_values(df, col) for col in cols], axis=0)
+
+
+def _divide(numerator, denominator):
+    """Divide, giving missing instead of a result where the denominator is 0 or missing"""
+    out = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=np.isfinite(denominator) & (denominator != 0))
+    return out
+
+
+def _state_shortfall(gaps, is_state):
+    """Sum of negative gaps over all districts other than the State of Illinois (per column)"""
+    negative = (gaps < 0) & ~is_state[:, None]
+    return np.where(negative, gaps, 0.0).sum(axis=0)
+
+
+def position_counts(df):
+    """Adequate and actual position counts from the EBF, IRC and EIS source columns"""
+    counts = {}
+    for adequate_col, adequate_inputs, actual_col, actual_inputs, *_ in POSITIONS:
+        counts[adequate_col] = _sum_inputs(df, adequate_inputs)
+        counts[actual_col] = _sum_inputs(df, actual_inputs)
+    counts[IRC_TEACHERS[0]] = _values(df, IRC_TEACHERS[1])
+    return pd.DataFrame(counts, index=df.index)
+
+
+def adequacy_metrics(df, irc_teachers=True):
+    """Add funding and position metrics to a frame of inputs, dropping districts without gaps.
+
+    df needs FUNDING_INPUTS, "RCDTS", and the adequate and actual position
+    columns from position_counts. Every result is computed from aligned
+    arrays; nothing is patched row by row.
+    """
+    is_state = (df["RCDTS"] == STATE_RCDTS).to_numpy()
+    ase = _values(df, "Total ASE")
+    school_count = _values(df, "School Count")
+    actual = _values(df, "EBF Base Calc Final Resources")
+    target = _values(df, "EBF Base Calc Final Adequacy Target")
+
+    # Funding. The gap per student uses EBF's own gap (positive = shortfall);
+    # the published gap is actual minus target (negative = shortfall).
+
+    gap = actual - target
+    has_gap = ~np.isnan(gap)
+    gap[is_state] = _state_shortfall(gap[has_gap, None], is_state[has_gap])[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap_per_school = gap / school_count
+    keep = has_gap & ~np.isnan(gap_per_school)
+    gap_per_school[is_state] = _state_shortfall(gap_per_school[keep, None], is_state[keep])[0]
+
+    out = {
+        "Actual Resources": actual,
+        "Actual Resources Per Student": _divide(actual, ase),
+        "Adequacy Target": target,
+        "Adequacy Target Per Student": _values(df, "EBF Base Calc Final Adequacy Target Per Student"),
+        "Adequacy Funding Gap": gap,
+        "Adequacy Funding Gap Per Student": _divide(_values(df, "EBF Base Calc Adequacy Funding Gap"), ase),
+        "Adequacy Level": _divide(actual, target),
+        "Adequacy Funding Gap Per School": gap_per_school,
+    }
+
+    # Positions: one column per position in a (districts x positions) array
+
+    adequate = np.column_stack([_values(df, p[0]) for p in POSITIONS])
+    actual_positions = np.column_stack([_values(df, p[2]) for p in POSITIONS])
+    gaps = actual_positions - adequate
+    fill_missing = np.array([p[6] for p in POSITIONS])
+    gaps[:, fill_missing] = np.nan_to_num(gaps[:, fill_missing], nan=0.0)
+    gaps[is_state] = _state_shortfall(gaps[keep], is_state[keep])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gaps_per_school = gaps / school_count[:, None]
+
+    for i, (adequate_col, _, actual_col, _, gap_col, per_school_col, _) in enumerate(POSITIONS):
+        out[adequate_col] = adequate[:, i]
+        out[actual_col] = actual_positions[:, i]
+        out[gap_col] = gaps[:, i]
+        out[per_school_col] = gaps_per_school[:, i]
+
+    if irc_teachers:
+        irc_gap = np.nan_to_num(_values(df, IRC_TEACHERS[0]) - (adequate[:, 0] + adequate[:, 1]), nan=0.0)
+        irc_gap[is_state] = _state_shortfall(irc_gap[keep, None], is_state[keep])[0]
+        out[IRC_TEACHERS[2]] = irc_gap
+
+    result = df.assign(**out)
+    return result[keep]
+
+
+def calculate_adequacy(df_x):
+    """Step 8 of the data cleaning notebook: joined source data in, all adequacy columns out"""
+    df = df_x.copy()
+    counts = position_counts(df)
+    for col in counts.columns:
+        df[col] = counts[col]
+    return adequacy_metrics(df)
+
+
+# Fixture
+
+def published_inputs(df_wide):
+    """Rebuild the calculation inputs from the published wide data"""
+    inputs = pd.DataFrame({
+        "RCDTS": df_wide["RCDTS"],
+        "Total ASE": df_wide["Total ASE"],
+        "School Count": df_wide["School Count"],
+        "EBF Base Calc Final Resources": df_wide["Actual Resources"],
+        "EBF Base Calc Final Adequacy Target": df_wide["Adequacy Target"],
+        "EBF Base Calc Final Adequacy Target Per Student": df_wide["Adequacy Target Per Student"],
+        "EBF Base Calc Adequacy Funding Gap": df_wide["Adequacy Funding Gap Per Student"] * df_wide["Total ASE"],
+    })
+    for adequate_col, _, actual_col, *_ in POSITIONS:
+        inputs[adequate_col] = df_wide[adequate_col]
+        inputs[actual_col] = df_wide[actual_col]
+    return inputs
+
+
+RESULT_COLUMNS = [
+    "Actual Resources", "Adequacy Target", "Adequacy Target Per Student", "Adequacy Funding Gap",
+    "Adequacy Funding Gap Per Student", "Adequacy Level", "Adequacy Funding Gap Per School",
+] + [col for p in POSITIONS for col in (p[4], p[5])]
+
+
+def write_fixture(wide_parquet=WIDE_PARQUET, path=GOLDEN_FIXTURE):
+    """Save the inputs and published results of every district as the fixture"""
+    df_wide = pd.read_parquet(wide_parquet)
+    inputs = published_inputs(df_wide).reset_index(drop=True)
+    expected = df_wide[RESULT_COLUMNS].reset_index(drop=True).add_prefix("expected: ")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.concat([inputs, expected], axis=1).to_parquet(path, index=False)
+    return path
+
+
+def check_fixture(path=GOLDEN_FIXTURE, rtol=1e-9):
+    """Recalculate the fixture inputs and return a frame of the results that differ"""
+    fixture = pd.read_parquet(path)
+    expected = fixture[[c for c in fixture.columns if c.startswith("expected: ")]]
+    expected.columns = [c[len("expected: "):] for c in expected.columns]
+    inputs = fixture.drop(columns=[c for c in fixture.columns if c.startswith("expected: ")])
+
+    result = adequacy_metrics(inputs, irc_teachers=False)
+    if len(result) != len(inputs):
+        dropped = inputs.loc[~inputs.index.isin(result.index), "RCDTS"].tolist()
+        return pd.DataFrame({"RCDTS": dropped, "column": "(row dropped)", "expected": np.nan, "result": np.nan})
+
+    diffs = []
+    for col in RESULT_COLUMNS:
+        want = expected[col].to_numpy(dtype=float)
+        got = result[col].to_numpy(dtype=float)
+        same = np.isclose(got, want, rtol=rtol, atol=1e-9, equal_nan=True)
+        for i in np.flatnonzero(~same):
+            diffs.append((inputs["RCDTS"].iloc[i], col, want[i], got[i]))
+    return pd.DataFrame(diffs, columns=["RCDTS", "column", "expected", "result"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the adequacy calculations against the published numbers")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--check", action="store_true", help="Recalculate the fixture and report differences")
+    action.add_argument("--write-fixture", action="store_true", help="Save a new fixture from app_data_wide.parquet")
+    parser.add_argument("--fixture", default=GOLDEN_FIXTURE)
+    args = parser.parse_args(argv)
+
+    if args.write_fixture:
+        print(f"Wrote {write_fixture(path=args.fixture)}")
+        return
+
+    diffs = check_fixture(args.fixture)
+    if len(diffs):
+        with pd.option_context("display.max_rows", 50, "display.width", 200):
+            print(diffs)
+        sys.exit(f"{len(diffs)} result(s) differ from {args.fixture}")
+    print(f"All results match {args.fixture}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,43 @@
 # Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
 
 import streamlit as st
-from PIL import Image
-import pandas as pd
-import plotly.express as px
-import numpy as np
-from streamlit_extras.stylable_container import stylable_container
+from peer_lite import lite_mode, lite_switch, styled_container, page_css, revenue_svg, demographics_svg
+from peer_warmup import log_selection, legislative_key
 
 
 # Page config
 
 st.set_page_config(page_title='🏫 IL school resource ≠ app', layout='centered')
 
+# Lite mode (see peer_lite.py): static charts and no page CSS for slow connections
+
+lite = lite_mode()
+
+# Tabs and expanders only run while they are open (see the NOTE above the
+# tabs), and streamlit forgets the value of a widget that isn't drawn. Setting
+# these values again keeps selections when someone switches tabs.
+
+PERSISTENT_KEYS = ["district_select", "desks_expander", "desks_dollars", "revenue_expander", "demographics_expander",
+                   "schools_expander", "compare_type", "compare_districts", "compare_county", "compare_chamber", "compare_leg_district",
+                   "compare_per_student", "compare_resource", "map_layer", "map_metric", "map_detail",
+                   "leg_filter_type", "leg_chamber", "leg_district"]
+
+for key in PERSISTENT_KEYS:
+    if key in st.session_state:
+        st.session_state[key] = st.session_state[key]
+
 # Read in and cahce data set
 
-@st.cache_data
+# NOTE: cache_resource keeps one memory-mapped copy of the Arrow tables per
+#       process (cache_data would pickle a private copy of the data), and the
+#       operating system shares the mapped pages between app processes.
+
+@st.cache_resource
 def load_data():
-    """Load the PEER app parquet file and legislative district coverage CSV"""
+    """Memory-map the PEER app data and legislative district coverage Arrow files"""
     try:
-        df = pd.read_parquet(r"app_data_wide.parquet")
-        df_leg = pd.read_csv(r"leg_dist_coverage.csv")
-        return df, df_leg
+        table_wide, table_leg = shared_tables()
+        return table_wide, table_leg
     except FileNotFoundError:
         st.error("Data file not found. Please ensure the parquet file is in the correct location.")
         return None, None
@@ -29,210 +46,128 @@ def load_data():
         st.error(f"Error loading data: {e}")
         return None, None
 
-df,df_leg = load_data()
+# NOTE: st.cache_data and st.cache_resource are keyed by their arguments only.
+#       When the data files change (see peer_refresh.py) every in-memory
+#       result is dropped, so a running app never serves numbers from the old
+#       data.
+
+@st.cache_resource
+def loaded_data_version():
+    """The data version the in-memory caches hold results for"""
+    return {"version": None}
+
+def clear_stale_caches():
+    """Clear the in-memory caches if the data files changed since they were filled"""
+    version = data_version()
+    loaded = loaded_data_version()
+    if loaded["version"] not in (None, version):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        loaded = loaded_data_version()
+    loaded["version"] = version
+
+@st.cache_resource
+def load_district_names(_table_wide):
+    """Cache school district names in file order"""
+    return district_names(_table_wide)
+
+# Log selections for cache warm-up (see peer_warmup.py). Only changes are
+# logged so reruns of the same page are not counted twice.
+
+def log_district_selection(district_name):
+    """Log a school district selection once per change in each session"""
+    if st.session_state.get("logged_district") != district_name:
+        log_selection("district", district_name)
+        st.session_state["logged_district"] = district_name
+
+def log_legislative_selection(chamber, district_number):
+    """Log a legislative district selection once per change in each session"""
+    key = legislative_key(chamber, district_number)
+    if st.session_state.get("logged_legislative") != key:
+        log_selection("legislative", key)
+        st.session_state["logged_legislative"] = key
+
+# Cache map geometries and figures. Geometries are shared across metrics and
+# figures are built once per layer, metric, and detail level.
+
+@st.cache_resource
+def load_cached_map_geometry(layer, level):
+    """Cache simplified map geometries"""
+    return load_map_geometry(layer, level)
+
+@st.cache_resource
+def load_map_figure(_table_wide, _table_leg, layer, metric, level):
+    """Cache map figures by layer, metric, and detail level"""
+    geojson = load_cached_map_geometry(layer, level)
+    if geojson is None:
+        return None
+    values = map_metric_values(select_columns(_table_wide, MAP_VALUE_COLUMNS), _table_leg.to_pandas(), layer, metric)
+    return build_map_figure(geojson, values, metric)
+
+def select_from_map():
+    """Feed a clicked map district into the School District View or Legislative View"""
+    points = st.session_state["district_map"]["selection"]["points"]
+    if not points:
+        return
+    location = points[0].get("location")
+    layer = st.session_state["map_layer"]
+    if MAP_LAYERS[layer][1] == "RCDTS":
+        name = district_name_for_rcdts(load_data()[0], location)
+        if name is not None:
+            st.session_state["district_select"] = name
+    else:
+        st.session_state["leg_filter_type"] = "Chamber & District"
+        st.session_state["leg_chamber"] = "House" if layer == "house" else "Senate"
+        st.session_state["leg_district"] = int(location)
 
-@st.cache_data
-def process_filtered_data(district_name):
-    """Cache filtered data processing"""
-    df_filtered = df[df['District Name (IRC)'] == district_name]
-    return df_filtered
+# Districts grouped by county for the comparison tab
 
-# Melt data into long format for charts and drop down menus.
+@st.cache_resource
+def load_county_groups(_table_wide):
+    """Cache school district names by county"""
+    return county_groups(_table_wide)
 
-@st.cache_data  
-def calculate_funding_metrics(df_filtered):
-    
-    # EBF adequacy
-    
-    df_adequacy = pd.melt(
-        df_filtered,
-        id_vars=["RCDTS","District Name (IRC)","Total ASE"],
-        value_vars=[
-            "Adequacy Target",
-            "Adequacy Target Per Student",
-            "Adequate Core and Specialist Teachers",
-            "Adequate Special Education Teachers",
-            "Adequate Counselors",
-            "Adequate Nurses",
-            "Adequate Psychologists",
-            "Adequate Principals",
-            "Adequate Assistant Principals",
-            "Adequate EL Teachers"
-            ],
-            var_name="Resource",
-            value_name="Adequate resources"
-            )
-    df_adequacy["Resource"] = df_adequacy["Resource"].str.replace("Adequate ", "", regex=False)
-    df_adequacy["Resource"] = df_adequacy["Resource"].str.replace("Adequacy Target", "Total Resources (Dollar Amount)", regex=False)
-    df_adequacy["Resource"] = df_adequacy["Resource"].str.replace("Adequate Target Per Student", "Total Resources Per Student (Dollar Amount)", regex=False)
-    
-    # Actual resources 
-
-    df_actual = pd.melt(
-        df_filtered,
-        id_vars=["RCDTS", "Total ASE"],
-        value_vars=[
-            "Actual Resources",
-            "Actual Core and Specialist Teachers Count (EIS)",
-            "Actual Special Education Teachers Count (EIS)",
-            "Actual Counselors Count (IRC)",
-            "Actual Nurses Count (IRC)",
-            "Actual Psychologists Count (IRC)",
-            "Actual Principals Count (EIS)",
-            "Actual Assistant Principals Count (EIS)",
-            "Actual EL Teachers (EIS)"
-        ],
-        var_name="Resource",
-        value_name="Actual"
-        )
-    df_actual["Resource"] = df_actual["Resource"].str.replace("Actual ", "", regex=False)
-    df_actual["Resource"] = df_actual["Resource"].str.replace(" Count (EIS)", "", regex=False)
-    df_actual["Resource"] = df_actual["Resource"].str.replace(" (EIS)", "", regex=False)
-    df_actual["Resource"] = df_actual["Resource"].str.replace(" Count (IRC)", "", regex=False)
-    df_actual["Resource"] = df_actual["Resource"].str.replace("Resources", "Total Resources (Dollar Amount)", regex=False)
-    df_actual["Resource"] = df_actual["Resource"].str.replace("Resources Per Student", "Total Resources Per Student (Dollar Amount)", regex=False)
-    
-    # Adequacy gaps
-
-    df_gaps = pd.melt(
-        df_filtered,
-        id_vars=["RCDTS", "Total ASE"],
-        value_vars=[
-             "Adequacy Funding Gap",
-            "Adequacy Funding Gap Per Student",
-            "Core and Specialist Teachers Gap (EIS)",
-            "Special Education Teachers Gap (EIS)",
-            "Counselors Gap (IRC)",
-            "Nurses Gap (IRC)",
-            "Psychologists Gap (IRC)",
-            "Principals Gap (EIS)",
-            "Assistant Principals Gap (EIS)",
-            "EL Teachers Gap (EIS)"
-        ],
-        var_name="Resource",
-        value_name="Gaps"
-        )
-    df_gaps["Resource"] = df_gaps["Resource"].str.replace("Adequacy Funding Gap", "Total Resources (Dollar Amount)", regex=False)
-    df_gaps["Resource"] = df_gaps["Resource"].str.replace("Adequacy Funding Gap Per Student", "Total Resources Per Student (Dollar Amount)", regex=False)
-    df_gaps["Resource"] = df_gaps["Resource"].str.replace(" Gap (EIS)", "", regex=False)
-    df_gaps["Resource"] = df_gaps["Resource"].str.replace(" Gap (IRC)", "", regex=False)
-
-    illinois_negative_gap_sum = df_gaps["Gaps"].min()   
-
-    # Adequacy gaps per school
-
-    df_gaps_perschool = pd.melt(
-        df_filtered,
-        id_vars=["RCDTS", "Total ASE"],
-        value_vars=[
-             "Adequacy Funding Gap Per School",
-            "Core and Specialist Teachers Gap Per School",
-            "Special Education Teachers Gap Per School",
-            "Counselors Gap Per School",
-            "Nurses Gap Per School",
-            "Psychologists Gap Per School",
-            "Principals Gap Per School",
-            "Assistant Principals Gap Per School",
-            "EL Teachers Gap Per School"
-        ],
-        var_name="Resource",
-        value_name="Gaps Per School"
-        )
-    df_gaps_perschool["Resource"] = df_gaps_perschool["Resource"].str.replace(" Gap Per School", "", regex=False)
-
-
-    illinois_negative_gap_sum_perschool = df_gaps["Gaps"].min()     
-
-    # Merge adequacy and actuals
-
-    df_merged = pd.merge(
-        df_adequacy,
-        df_actual,
-        on=["RCDTS", "Resource", "Total ASE"],
-        how="left"
-    )
-
-    # Merge gaps
-
-    df_merged = pd.merge(
-        df_merged,
-        df_gaps,
-        on=["RCDTS", "Resource", "Total ASE"],
-        how="left"
-    )
-
-    # Merge gaps per school
-
-    df_merged = pd.merge(
-        df_merged,
-        df_gaps_perschool,
-        on=["RCDTS", "Resource", "Total ASE"],
-        how="left"
-    )
-
-    # Demographics melt
-
-    df_demographics = pd.melt(
-    df_filtered,
-    id_vars=["RCDTS", "District Name (IRC)", "Total ASE"],
-    value_vars=[
-        "White (%)", "Black (%)", "Latine (%)", "Asian (%)",
-        "Native Hawaiian or Other Pacific Islander (%)",
-        "American Indian or Alaska Native (%)","IEP (%)", "EL (%)", "Low Income (%)"
-    ],
-    var_name="Demographic Group",
-    value_name="Demographic Percentages"
-    )
-
-    # Demographics column name formatting
-
-    df_demographics["Demographic Group"] = df_demographics["Demographic Group"].str.replace(" (%)", "", regex=False)
-
-    # Revenue melt
-
-    df_revenue = pd.melt(
-        df_filtered,
-        id_vars=["RCDTS"],
-        value_vars=[
-             "Local Property Taxes (%)", "Other Local Funding (%)", 
-            "Evidence-Based Funding (%)", "Other State Funding (%)", 
-            "Federal Funding (%)"
-        ],
-        var_name="Revenue Source",
-        value_name="Revenue Percentages"
-        )
-    
-    # Revenue column name formatting
+MAX_COMPARE_DISTRICTS = 20
 
-    df_revenue["Revenue Source"] = df_revenue["Revenue Source"].str.replace(" (%)", "", regex=False)
+st.image("logo.jpg")
+lite_switch()
 
-    # Resource filter formatting
 
-    resource_filter = "Total Resources (Dollar Amount)"
-    df_resource = df_merged[df_merged["Resource"] == resource_filter]
-    
-    # Get the actual and adequate resources variables
-    
-    actual_resources = df_resource["Actual"].iloc[0]
-    adequate_resources = df_resource["Adequate resources"].iloc[0]
-    ase = df_resource["Total ASE"].iloc[0]
-    
-    return actual_resources, adequate_resources, ase, df_merged, df_demographics, df_revenue, illinois_negative_gap_sum, illinois_negative_gap_sum_perschool 
+# NOTE: on_change="rerun" makes the tabs lazy: only the open tab runs, and
+#       each tab loads the data it needs when it is opened. The first page
+#       ("Start Here!") reads no data and builds no charts (see peer_profile.py
+#       for the startup budget).
 
-st.image("logo.jpg")
+tab0,tab1,tab_compare,tab_map,tab2,tab3 = st.tabs(["Start Here!","School District View","Compare Districts","Statewide Map","Legislative View","About"], key="main_tab", on_change="rerun") # Erykah - Change tab names
 
+# Data and chart modules. They load pandas and pyarrow, which take longer to
+# import than the rest of the app, so they are only imported once a tab other
+# than "Start Here!" is open.
 
-tab0,tab1,tab2,tab3 = st.tabs(["Start Here!","School District View","Legislative View","About"]) # Erykah - Change tab names
+if not tab0.open:
+    import pandas as pd
+    from peer_data import shared_tables, district_names, district_name_for_rcdts, select_columns, leg_chambers, leg_district_numbers, leg_legislators, filter_leg, county_groups, leg_school_district_names
+    from peer_metrics import calculate_funding_metrics, process_filtered_data, compare_districts, district_schools, staffing_costs, RESOURCE_COLUMNS
+    from peer_compensation import dollars_to_positions
+    from peer_charts import revenue_figure, demographics_figure, comparison_adequacy_figure, comparison_funding_figure, comparison_positions_figure
+    from peer_tables import legislative_arrow_tables, show_table
+    from peer_exports import district_export, legislative_export, statewide_export, download_buttons
+    from peer_maps import MAP_LAYERS, MAP_VALUE_COLUMNS, MAP_METRICS, MAP_DETAIL_LEVELS, load_map_geometry, map_metric_values, build_map_figure
+    from peer_cache import data_version
+    clear_stale_caches()
 
-with tab0:
-    st.markdown("""<h4><i>Urgent investment is needed to fulfill the promise of EBF</i></h4> """,unsafe_allow_html=True)
-    st.markdown("""The <b>Evidence-Based Funding for Student Success Act</b> (EBF) was designed to guarantee the resources public schools need to deliver an “adequate” education as defined by the Act. It was enacted by the Illinois legislature in 2017 with wide support by education experts and justice advocates, but <b>since its enactment Illinois has increased education funding by no more than the minimum</b> level set out in the law. 
+if tab0.open:
+    with tab0:
+        st.markdown("""<h4><i>Urgent investment is needed to fulfill the promise of EBF</i></h4> """,unsafe_allow_html=True)
+        st.markdown("""The <b>Evidence-Based Funding for Student Success Act</b> (EBF) was designed to guarantee the resources public schools need to deliver an “adequate” education as defined by the Act. It was enacted by the Illinois legislature in 2017 with wide support by education experts and justice advocates, but <b>since its enactment Illinois has increased education funding by no more than the minimum</b> level set out in the law. 
 
 This leaves school communities across Illinois — especially those with the greatest needs — without access to sufficient funding.
 
 Use this tool to learn more about how far school districts are from adequate funding, what makes up their revenue, their demographics, and what full funding could mean for each district. 
 
 - Toggle to the “School District View” tab to view your district’s funding levels, staffing needs, revenue sources, and demographics. 
+- Toggle to the “Compare Districts” tab to compare up to 20 districts, or every district in a county or legislative district, side by side.
+- Toggle to the “Statewide Map” tab to compare adequacy levels and gaps across every district in Illinois.
 - Toggle to the “Legislative View” tab to view the same data categorized by legislator. Use this to inform your school funding advocacy efforts in your district.
 - Learn more about EBF on our “How IL School Funding Works” page.
                 
@@ -240,19 +175,22 @@ Use this tool to learn more about how far school districts are from adequate fun
 
 # Present adequacy level by district
 
-if df is not None and df_leg is not None:
+if tab1.open:
+    table_wide, table_leg = load_data()
+
+    if table_wide is not None and table_leg is not None:
     
-# Get unique districts and set default to "State of Illinois"
+    # Get unique districts and set default to "State of Illinois"
 
-   districts = df['District Name (IRC)'].unique() # This was a relic from when we used long data. It's superfluous now since data is wide not long but it is functional.
-   default_index = 0
-   if "State of Illinois" in districts:
-       default_index = list(districts).index("State of Illinois")
+       districts = load_district_names(table_wide)
+       default_index = 0
+       if "State of Illinois" in districts:
+           default_index = list(districts).index("State of Illinois")
 
-with tab1:
-    with stylable_container(
-        key="select_dist",
-        css_styles="""
+    with tab1:
+        with styled_container(
+            key="select_dist",
+            css_styles="""
             {
                 background-color: None;
                 border-radius: 10px;
@@ -262,28 +200,29 @@ with tab1:
             }
 
         """,
-    ):
-        st.markdown("""<h5>Select a district to view resource needs</h5>          
+        ):
+            st.markdown("""<h5>Select a district to view resource needs</h5>          
 
 """,unsafe_allow_html=True)
 
-    # selection = st.selectbox("", districts, index=default_index)
-    # df_filtered = process_filtered_data(selection)
+        # selection = st.selectbox("", districts, index=default_index)
+        # df_filtered = process_filtered_data(selection)
 
-    with tab1:
-        st.markdown("""
+        with tab1:
+            st.markdown("""
 Click the dropdown below to select a specific school district and view how much funding is needed to be fully funded, where current funding stands, and the gap between current and adequate funding.
 
 Additional information below includes demographic data, how much staffing could be added if that district was fully funded, and revenue source data.""",unsafe_allow_html=True)
 
-        selection = st.selectbox("", districts, index=default_index)
-        df_filtered = process_filtered_data(selection)
+            selection = st.selectbox("", districts, index=default_index, key="district_select")
+            df_filtered = process_filtered_data(selection)
+            log_district_selection(selection)
 
-adequacy_level = df_filtered["Adequacy Level"].unique()[0]
+    adequacy_level = df_filtered["Adequacy Level"].unique()[0]
 
-# Adequacy level and adequacy gaps CSS
+    # Adequacy level and adequacy gaps CSS
 
-st.markdown("""
+    page_css("""
 <style>
 
 /* ✅ Download fonts, load font weights, enable font fallback */            
@@ -378,13 +317,13 @@ st.markdown("""
 }
                                
 </style>
-""", unsafe_allow_html=True)
+""")
 
 
-with tab1:
-    with stylable_container(
-        key="adequacy_level_container",
-        css_styles="""
+    with tab1:
+        with styled_container(
+            key="adequacy_level_container",
+            css_styles="""
             {
                 background-color: #e0e7ff;
                 border-radius: 10px;
@@ -394,66 +333,66 @@ with tab1:
                 font-family: Poppins;
             }
         """,
-    ):
-        if selection == "State of Illinois":
-            st.markdown(f'<h2 class="adequacy-level"><span class="illinois-text">Illinois school districts</span> have <span class="illinois-text">{adequacy_level * 100:.0f}%</span> of the state and local funding needed to be adequately funded.</h2>', unsafe_allow_html=True)
-        elif adequacy_level <= 1:
-            st.markdown(f'<h2 class="adequacy-level"><span class="district-negative">{selection}</span> has <span class="district-negative">{adequacy_level * 100:.0f}%</span> of the state and local funding needed to be adequately funded.</h2>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<h2 class="adequacy-level"><span class="district-positive">{selection}</span> has <span class="district-positive">{adequacy_level * 100:.0f}%</span> of the state and local funding needed to be adequately funded.</h2>', unsafe_allow_html=True)
-        if st.button("💡 Adequate Funding Explained", key="help_button"):
-            st.session_state.show_help = not st.session_state.get('show_help', False)
-        if st.session_state.get('show_help', False):
-            st.markdown("""
+        ):
+            if selection == "State of Illinois":
+                st.markdown(f'<h2 class="adequacy-level"><span class="illinois-text">Illinois school districts</span> have <span class="illinois-text">{adequacy_level * 100:.0f}%</span> of the state and local funding needed to be adequately funded.</h2>', unsafe_allow_html=True)
+            elif adequacy_level <= 1:
+                st.markdown(f'<h2 class="adequacy-level"><span class="district-negative">{selection}</span> has <span class="district-negative">{adequacy_level * 100:.0f}%</span> of the state and local funding needed to be adequately funded.</h2>', unsafe_allow_html=True)
+            else:
+                st.markdown(f'<h2 class="adequacy-level"><span class="district-positive">{selection}</span> has <span class="district-positive">{adequacy_level * 100:.0f}%</span> of the state and local funding needed to be adequately funded.</h2>', unsafe_allow_html=True)
+            if st.button("💡 Adequate Funding Explained", key="help_button"):
+                st.session_state.show_help = not st.session_state.get('show_help', False)
+            if st.session_state.get('show_help', False):
+                st.markdown("""
         <div class="adequacy-help-content">
         Adequate funding refers to the total cost of resources necessary to educate students (for example, teachers, support staff, computer equipment, and professional development to improve teaching). This number is calculated by [Illinois' K-12 Evidence-Based Funding Formula](https://www.isbe.net/ebf).
         </div>
         """, unsafe_allow_html=True)
 
-    # Data processing and calculations for adequacy funding metrics
+        # Data processing and calculations for adequacy funding metrics
 
-    if 'df_filtered' in locals() and not df_filtered.empty:
+        if 'df_filtered' in locals() and not df_filtered.empty:
     
-    # First filter by the value "Total Resources (Dollar Amount)"
+        # First filter by the value "Total Resources (Dollar Amount)"
 
-        actual_resources, adequate_resources, ase, df_merged, df_demographics, df_revenue, illinois_negative_gap_sum, illinois_negative_gap_sum_perschool = calculate_funding_metrics(df_filtered)
+            actual_resources, adequate_resources, ase, df_merged, df_demographics, df_revenue, illinois_negative_gap_sum, illinois_negative_gap_sum_perschool = calculate_funding_metrics(selection)
     
-    # Calculate per pupil values
+        # Calculate per pupil values
     
-    actual_per_pupil = actual_resources / ase if ase > 0 else 0
-    adequate_per_pupil = adequate_resources / ase if ase > 0 else 0
-    if selection == "State of Illinois":
-        gap_per_pupil = illinois_negative_gap_sum / ase if ase > 0 else 0
-    else:
-        gap_per_pupil = actual_per_pupil - adequate_per_pupil
-
-    # Determine which values to display based on button state (full or per pupil funding)
-    if 'show_per_pupil' not in st.session_state:
-        st.session_state.show_per_pupil = False
-
-    if st.session_state.show_per_pupil:
-        display_adequate = adequate_per_pupil
-        display_actual = actual_per_pupil
-        display_gap = gap_per_pupil
-        currency_format = "${:,.0f}"
-        chart_title_suffix = " (Per Pupil)"
-    else:
-        display_adequate = adequate_resources
-        display_actual = actual_resources
+        actual_per_pupil = actual_resources / ase if ase > 0 else 0
+        adequate_per_pupil = adequate_resources / ase if ase > 0 else 0
         if selection == "State of Illinois":
-            display_gap =  -5679275708 
+            gap_per_pupil = illinois_negative_gap_sum / ase if ase > 0 else 0
+        else:
+            gap_per_pupil = actual_per_pupil - adequate_per_pupil
+
+        # Determine which values to display based on button state (full or per pupil funding)
+        if 'show_per_pupil' not in st.session_state:
+            st.session_state.show_per_pupil = False
 
+        if st.session_state.show_per_pupil:
+            display_adequate = adequate_per_pupil
+            display_actual = actual_per_pupil
+            display_gap = gap_per_pupil
+            currency_format = "${:,.0f}"
+            chart_title_suffix = " (Per Pupil)"
         else:
-            display_gap = actual_resources - adequate_resources
-        currency_format = "${:,.0f}"
-        chart_title_suffix = ""
+            display_adequate = adequate_resources
+            display_actual = actual_resources
+            if selection == "State of Illinois":
+                display_gap =  -5679275708 
+
+            else:
+                display_gap = actual_resources - adequate_resources
+            currency_format = "${:,.0f}"
+            chart_title_suffix = ""
 
     
         
 
-    with stylable_container(
-        key="adequacy_dollars",
-        css_styles="""
+        with styled_container(
+            key="adequacy_dollars",
+            css_styles="""
             {
                 background-color: #e0e7ff;
                 border-radius: 10px;
@@ -477,16 +416,16 @@ with tab1:
                     font-family: Poppins;
                 }
         """,
-    ):
-        if st.session_state.show_per_pupil:
-            title_text = "💰 The Dollars and Cents of Adequate Funding Per Pupil 🪙"
-        else:
-            title_text = "💰 The Dollars and Cents of Adequate Funding 🪙"
-        st.markdown(f'<h3 class="adequacy-explained-a">{title_text}</h3>', unsafe_allow_html=True)
-        st.markdown("---")
-        with stylable_container(
-            key="school_funding_needs",
-            css_styles="""
+        ):
+            if st.session_state.show_per_pupil:
+                title_text = "💰 The Dollars and Cents of Adequate Funding Per Pupil 🪙"
+            else:
+                title_text = "💰 The Dollars and Cents of Adequate Funding 🪙"
+            st.markdown(f'<h3 class="adequacy-explained-a">{title_text}</h3>', unsafe_allow_html=True)
+            st.markdown("---")
+            with styled_container(
+                key="school_funding_needs",
+                css_styles="""
                 {
                     background-color: ghostwhite;
                     border-radius: 10px;
@@ -498,12 +437,12 @@ with tab1:
                     
                 }
             """,
-        ):
-            st.subheader('Fiscal Year 2026 Adequacy Target:',help="The amount the EBF formula says your district needs to be adequately funded.")
-            st.markdown(f'<h2 class="adequacy-dollars-amount">${display_adequate:,.0f}</h2>', unsafe_allow_html=True)
-        with stylable_container(
-            key="school_funding_resources",
-            css_styles="""
+            ):
+                st.subheader('Fiscal Year 2026 Adequacy Target:',help="The amount the EBF formula says your district needs to be adequately funded.")
+                st.markdown(f'<h2 class="adequacy-dollars-amount">${display_adequate:,.0f}</h2>', unsafe_allow_html=True)
+            with styled_container(
+                key="school_funding_resources",
+                css_styles="""
                 {
                     background-color: ghostwhite;
                     border-radius: 10px;
@@ -511,12 +450,12 @@ with tab1:
                     margin-bottom: 16px;
                 }
             """,
-        ):
-            st.subheader('EBF Final Resources:',help="The actual dollars your district receives from EBF this year.")
-            st.markdown(f'<h2 class="adequacy-dollars-amount">${display_actual:,.0f}</h2>', unsafe_allow_html=True)
-        with stylable_container(
-            key="school_funding_gap",
-            css_styles="""
+            ):
+                st.subheader('EBF Final Resources:',help="The actual dollars your district receives from EBF this year.")
+                st.markdown(f'<h2 class="adequacy-dollars-amount">${display_actual:,.0f}</h2>', unsafe_allow_html=True)
+            with styled_container(
+                key="school_funding_gap",
+                css_styles="""
                 {
                     background-color: ghostwhite;
                     border-radius: 10px;
@@ -524,26 +463,26 @@ with tab1:
                     margin-bottom: 16px;
                 }
             """,
-        ):
+            ):
         
-            gap_class = "gap-positive" if display_gap > 0 else "gap-negative"
-            if display_gap < 0 and selection == "State of Illinois":
-                st.subheader('EBF School Funding Gap:',help="NOTE: The State of Illinois calculates the gap as the sum off all gaps. This is why the gap will not be the difference between the total adequacy target and final resources.")
-                st.markdown(f'<h2 class="{gap_class}">${display_gap:,.0f}</h2>', unsafe_allow_html=True)
-            elif display_gap < 0:
-                st.subheader('School Funding Gap:')
-                st.markdown(f'<h2 class="{gap_class}">${display_gap:,.0f}</h2>', unsafe_allow_html=True)
-            else:
-                st.subheader('EBF School Funding Surplus:')
-                st.markdown(f'<h2 class="{gap_class}">${display_gap:,.0f}</h2>', unsafe_allow_html=True)
+                gap_class = "gap-positive" if display_gap > 0 else "gap-negative"
+                if display_gap < 0 and selection == "State of Illinois":
+                    st.subheader('EBF School Funding Gap:',help="NOTE: The State of Illinois calculates the gap as the sum off all gaps. This is why the gap will not be the difference between the total adequacy target and final resources.")
+                    st.markdown(f'<h2 class="{gap_class}">${display_gap:,.0f}</h2>', unsafe_allow_html=True)
+                elif display_gap < 0:
+                    st.subheader('School Funding Gap:')
+                    st.markdown(f'<h2 class="{gap_class}">${display_gap:,.0f}</h2>', unsafe_allow_html=True)
+                else:
+                    st.subheader('EBF School Funding Surplus:')
+                    st.markdown(f'<h2 class="{gap_class}">${display_gap:,.0f}</h2>', unsafe_allow_html=True)
         
-        button_text = "🏫 View Total Funding" if st.session_state.show_per_pupil else "👩‍🎓 View Per Pupil Funding"
-        if st.button(button_text, key="funding_toggle_button"):
-            st.session_state.show_per_pupil = not st.session_state.show_per_pupil
-            st.rerun()
+            button_text = "🏫 View Total Funding" if st.session_state.show_per_pupil else "👩‍🎓 View Per Pupil Funding"
+            if st.button(button_text, key="funding_toggle_button"):
+                st.session_state.show_per_pupil = not st.session_state.show_per_pupil
+                st.rerun()
 
-    # Expander CSS
-    st.markdown("""
+        # Expander CSS
+        page_css("""
     <style>
     /* Center container text */
     .stElementContainer element-container st-emotion-cache-zh2fnc e52wr8w0 {
@@ -603,109 +542,81 @@ with tab1:
     justify-content: center;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """)
 
 
 
-    with st.expander("👩‍🏫 From Dollars to Desks: Explore Adequate Staffing 👩‍⚕️", expanded=False):
+        with st.expander("👩‍🏫 From Dollars to Desks: Explore Adequate Staffing 👩‍⚕️", expanded=False, key="desks_expander", on_change="rerun") as desks_expander:
+            if desks_expander.open:
 
-        st.markdown("""<i>While EBF expenditures are not prescriptive, these examples use data on current position vacancies to demonstrate how additional resources and/or other local conditions could be impacting staffing in your district.</i>""",unsafe_allow_html=True)
+                st.markdown("""<i>While EBF expenditures are not prescriptive, these examples use data on current position vacancies to demonstrate how additional resources and/or other local conditions could be impacting staffing in your district.</i>""",unsafe_allow_html=True)
     
-        # Create a drop down menue that filters by resource types:
-
-        resource_filter = st.selectbox("Select Resource Type", options=[
-            "Core and Specialist Teachers",
-            "Special Education Teachers",
-            "Counselors",
-            "Nurses",
-            "Psychologists",
-            "Principals",
-            "Assistant Principals",
-            "English Learner (EL) Teachers"
-        ])   
+                # Create a drop down menue that filters by resource types:
+
+                # Options are the position names in df_merged; EL Teachers is spelled out for display
+
+                resource_filter = st.selectbox("Select Resource Type", options=[
+                    "Core and Specialist Teachers",
+                    "Special Education Teachers",
+                    "Counselors",
+                    "Nurses",
+                    "Psychologists",
+                    "Principals",
+                    "Assistant Principals",
+                    "EL Teachers"
+                ], format_func=lambda resource: "English Learner (EL) Teachers" if resource == "EL Teachers" else resource)
     
-        # Filter the dataframe based on the selected resource type
-
-        df_resource = df_merged[df_merged["Resource"] == resource_filter]
-
-        # Get the adequacy gap per school for the selected resource type
-
-        adequacy_gap_per_school = df_resource["Gaps Per School"].iloc[0] if not df_resource.empty else 0
-        adequacy_gap = df_resource["Gaps"].iloc[0] if not df_resource.empty else 0
-        resource_type = resource_filter.lower()
-        if selection == "State of Illinois":
-                if adequacy_gap >= 0:  # Positive gap (adequately staffed)
-                    st.text(f"According to the EBF formula, Illinois schools are adequately staffed with {resource_type} positions; however, this may not reflect the on-the-ground needs at your school.")
-                else:  # Negative gap (understaffed)
-                    st.text(f"A fully funded EBF formula could mean {abs(adequacy_gap):,.0f} more {resource_type} positions in Illinois.")
-        else:  # Specific district selected
-            if adequacy_gap_per_school >= 0:  # Positive gap (adequately staffed)
-                    st.text(f"According to the EBF formula, your school district is adequately staffed with {resource_type} positions; however, this may not reflect the on-the-ground needs at your school.")
-            else:  # Negative gap (understaffed)
-                    st.text(f"A fully funded EBF formula could mean {abs(adequacy_gap_per_school):.2f} more {resource_type} positions per school in your district.")
-
-    # Expandable container for revenue sources
-
-    with st.expander("💰 Revenue by Source 💰"):
+                # Filter the dataframe based on the selected resource type
+
+                df_resource = df_merged[df_merged["Resource"] == resource_filter]
+
+                # Get the adequacy gap per school for the selected resource type
+
+                adequacy_gap_per_school = df_resource["Gaps Per School"].iloc[0] if not df_resource.empty else 0
+                adequacy_gap = df_resource["Gaps"].iloc[0] if not df_resource.empty else 0
+                resource_type = "English Learner (EL) teachers" if resource_filter == "EL Teachers" else resource_filter.lower()
+                if selection == "State of Illinois":
+                        if adequacy_gap >= 0:  # Positive gap (adequately staffed)
+                            st.text(f"According to the EBF formula, Illinois schools are adequately staffed with {resource_type} positions; however, this may not reflect the on-the-ground needs at your school.")
+                        else:  # Negative gap (understaffed)
+                            st.text(f"A fully funded EBF formula could mean {abs(adequacy_gap):,.0f} more {resource_type} positions in Illinois.")
+                else:  # Specific district selected
+                    if adequacy_gap_per_school >= 0:  # Positive gap (adequately staffed)
+                            st.text(f"According to the EBF formula, your school district is adequately staffed with {resource_type} positions; however, this may not reflect the on-the-ground needs at your school.")
+                    else:  # Negative gap (understaffed)
+                            st.text(f"A fully funded EBF formula could mean {abs(adequacy_gap_per_school):.2f} more {resource_type} positions per school in your district.")
+
+                # What the gaps cost at the district's average EIS salary and benefits (see peer_compensation.py)
+
+                costs = staffing_costs()
+                rcdts = df_filtered["RCDTS"].iloc[0]
+                if costs is not None and resource_filter in costs["compensation"].columns:
+                    compensation = costs["compensation"].at[rcdts, resource_filter]
+                    if pd.notna(compensation):
+                        gap_cost = costs["gap_costs"].at[rcdts, resource_filter]
+                        funded_positions = costs["funding_gap_positions"].at[rcdts, resource_filter]
+                        st.text(f"The average salary and benefits for {resource_type} are ${compensation:,.0f} a year.")
+                        if gap_cost > 0:
+                            st.text(f"Filling the {resource_type} gap would cost about ${gap_cost:,.0f} a year.")
+                        if funded_positions > 0:
+                            st.text(f"Closing the funding gap would pay for about {funded_positions:,.0f} {resource_type} positions.")
+                        dollars = st.number_input("Try an amount of new funding ($):", min_value=0, value=1_000_000, step=100_000, key="desks_dollars")
+                        st.text(f"${dollars:,.0f} a year would pay for about {float(dollars_to_positions(dollars, compensation)):,.1f} {resource_type} positions.")
+
+        # Expandable container for revenue sources. Like the other expanders it only
+        # runs while open, so plotly is loaded when the first chart is shown.
+
+        with st.expander("💰 Revenue by Source 💰", key="revenue_expander", on_change="rerun") as revenue_expander:
+            if revenue_expander.open:
         
-        df_revenue = df_revenue.sort_values('Revenue Percentages', ascending=False)
-
-        # Create a bar chart for revenue sources
-        fig_rev = px.bar(
-        df_revenue, 
-        x='Revenue Source', 
-        y='Revenue Percentages',
-        color='Revenue Source',
-        color_discrete_sequence=px.colors.qualitative.Pastel,
-        labels={'Revenue Percentages': 'Percent of Total Revenue (%)', 'Revenue Source': ''},
-        text='Revenue Percentages'
-    )
-        # Format the chart
-
-        fig_rev.update_traces(
-            
-            # Format the text labels to show percentages
-
-            texttemplate='%{text:.0%}',
-            textposition='outside',
-            hovertemplate='%{y:.2%}<extra></extra>'
-        )
-
-        # Calculate the max value to set y-axis range
-
-        max_revenue = df_revenue['Revenue Percentages'].max()
-        y_rev_max = max_revenue * 1.3  # 30% higher than max value
-
-        fig_rev.update_layout(
-    title="",
-    showlegend=False,
-    xaxis_title="",
-    yaxis_title="Percent of Total Revenue (%)",
-    height=600,
-    margin=dict(t=80),
-    transition_duration=500,
-    transition_easing="cubic-in-out",
-    plot_bgcolor='white',
-    paper_bgcolor='white',
-    font=dict(color='#141554'),
-    xaxis=dict(
-        tickangle=90,
-        tickfont=dict(color='#141554', size=12),
-        color='#141554',
-        automargin=True
-    ),
-    yaxis=dict(
-        tickformat='.0%',
-        range=[0,y_rev_max],
-        tickfont=dict(color='#141554', size=12),
-        color='#141554'
-    )
-)
-        fig_rev.update_yaxes(title_font_color='#141554')
-        st.plotly_chart(fig_rev, use_container_width=True)
-        st.markdown("""<sub> <b>Source:</b> [Illinois State Board of Education Report Card School Year 2025](https://www.isbe.net/reportcard)</sub>""",unsafe_allow_html=True)
-
-        st.markdown("""
+                if lite:
+                    st.image(revenue_svg(selection), width="stretch")
+                else:
+                    fig_rev = revenue_figure(selection)
+                    st.plotly_chart(fig_rev, use_container_width=True)
+                st.markdown("""<sub> <b>Source:</b> [Illinois State Board of Education Report Card School Year 2025](https://www.isbe.net/reportcard)</sub>""",unsafe_allow_html=True)
+
+                st.markdown("""
 <sub><b>Other local funding</b> comes from a variety of sources like fees for tuition, transportation, or textbooks.</sub>
 
 <sub><b>Other state funding</b> comes from grants specifically for special education, transportation, bilingual education, and career and technical education.</sub>
@@ -714,74 +625,132 @@ with tab1:
                     """,unsafe_allow_html=True)
 
 
-    # Expandable container for demographics
-        
-    with st.expander("🧑🏿‍🎓 Demographics 👩🏻‍🎓"):
-#        df_demographics = df_demographics.sort_values('Demographic Percentages', ascending=False)
-    # Create a bar chart for demographics
-        fig_demo = px.bar(
-            df_demographics, 
-            x='Demographic Group', 
-            y='Demographic Percentages',
-            color='Demographic Group',
-            color_discrete_sequence=px.colors.qualitative.Pastel,
-            labels={'Demographic Percentages': 'Percentage of Students (%)', 'Demographic Group': ''},
-            text='Demographic Percentages',
-            title="Student Demographics"
-        )
-            
-        # Format the chart
-
-        fig_demo.update_traces(
-            texttemplate='%{text:.0%}',
-            textposition='outside',
-            textfont=dict(size=12, color='#141554',family='Poppins'),
-            hovertemplate='%{y:.2%}<extra></extra>'
-        )
+        # Expandable container for demographics
         
-        # Calculate max value and set y-axis range
-
-        max_demographic = df_demographics['Demographic Percentages'].max()
-        y_demo_max = max_demographic * 1.3  # 30% higher than max value
-
-        fig_demo.update_layout(
-            showlegend=False,
-            title="",
-            title_x=0.5,
-            title_font_size=20,
-            xaxis_title="",
-            yaxis_title="Percentage of Students (%)",
-        
-            margin=dict(t=80),
-            height=600,
-            transition_duration=1000,
-            transition_easing="cubic-in-out",
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            font=dict(color='#141554'),
-            xaxis=dict(
-                tickangle=90,
-                tickfont=dict(color='#141554', size=12),
-                color='#141554',
-                automargin=True
-            ),
-            yaxis=dict(
-                tickformat='.0%',
-                range=[0,y_rev_max],
-                tickfont=dict(color='#141554', size=12),
-                color='#141554'
-            )
-        )
-        fig_demo.update_yaxes(title_font_color='#141554')
-        
-        st.plotly_chart(fig_demo, width="content")
-        st.markdown("""<sub> <b>Source:</b> [Illinois State Board of Education Report Card School Year 2025](https://www.isbe.net/reportcard)</sub>
+        with st.expander("🧑🏿‍🎓 Demographics 👩🏻‍🎓", key="demographics_expander", on_change="rerun") as demographics_expander:
+            if demographics_expander.open:
+                if lite:
+                    st.image(demographics_svg(selection), width="stretch")
+                else:
+                    fig_demo = demographics_figure(selection)
+                    st.plotly_chart(fig_demo, width="content")
+                st.markdown("""<sub> <b>Source:</b> [Illinois State Board of Education Report Card School Year 2025](https://www.isbe.net/reportcard)</sub>
                     
 <sub><b>Notes:</b> 1) If no percentage is displayed above the bar it means that this data was redacted by the Illinois State Board of Education (ISBE), not that there are 0 students of the demographic group. ISBE redacts demographic data when the student count is below 10. 2) If 0% is displayed above the bar it may mean that the demographic group comprised less than 1% of total students in that demographic group, not that there were 0 students of that demographic group. Hover over the bar to see the true percentage, or tap on the bar if you are using a phone or tablet. You may have to use the zoom tool (the magnifying glass icon above the chart) to zoom into a bar that is below 0 to see the true percentage. 3) Percentages do not add up to 100 percent. For more information on this see the "About the Data" note in the "About" tab.</sub> 
                     """,unsafe_allow_html=True)
 
-with tab2:
-    st.markdown("""<h4>Legislative View</h4> 
+        # Expandable container for the district's schools. Nothing is read from
+        # the school file until the expander is opened.
+
+        if selection != "State of Illinois":
+            with st.expander("🏫 Schools in this District 🏫", key="schools_expander", on_change="rerun") as schools_expander:
+                if schools_expander.open:
+                    df_district_schools = district_schools(selection)
+                    if df_district_schools is None:
+                        st.info("School-level data is not available yet.")
+                    elif df_district_schools.empty:
+                        st.info("No schools were found for this district in the Illinois Report Card.")
+                    else:
+                        show_table(df_district_schools, "schools")
+                        st.markdown("""<sub> <b>Source:</b> [Illinois State Board of Education Report Card School Year 2025](https://www.isbe.net/reportcard)</sub>
+
+<sub><b>Note:</b> Adequacy is calculated for school districts, not schools. A school's share of the district's funding surplus/gap and core and specialist teacher gap is the district's amount times the school's share of district enrollment.</sub>
+                    """,unsafe_allow_html=True)
+
+        # Downloads
+
+        st.markdown("""<h5>Download this district's data</h5>""",unsafe_allow_html=True)
+        download_buttons(district_export, (selection,), selection, "district_download")
+
+if tab_compare.open:
+    table_wide, table_leg = load_data()
+    districts = load_district_names(table_wide)
+
+    with tab_compare:
+        st.markdown("""<h4>Compare Districts</h4> 
+
+Compare adequacy levels, funding, and staffing gaps for several school districts side by side. Choose up to 20 districts, or every district in a county or legislative district.
+                                
+""",unsafe_allow_html=True) 
+
+        compare_type = st.radio(
+            "Compare:",
+            ["Selected Districts", "County", "Legislative District"],
+            horizontal=True,
+            key="compare_type"
+        )
+
+        if compare_type == "Selected Districts":
+            compare_options = [d for d in districts if d != "State of Illinois"]
+            compare_selection = st.multiselect("Select districts:", compare_options, max_selections=MAX_COMPARE_DISTRICTS, key="compare_districts")
+        elif compare_type == "County":
+            counties = load_county_groups(table_wide)
+            compare_county = st.selectbox("Select county:", list(counties), key="compare_county")
+            compare_selection = counties[compare_county]
+        else:
+            compare_chamber = st.selectbox("Select ILGA Chamber:", leg_chambers(table_leg), key="compare_chamber")
+            compare_district = st.selectbox("Select by District:", leg_district_numbers(table_leg, compare_chamber), key="compare_leg_district")
+            compare_selection = leg_school_district_names(table_wide, filter_leg(table_leg, chamber=compare_chamber, district_number=compare_district))
+
+        # Sorted so the same set of districts always hits the same cache entry
+
+        compare_names = tuple(sorted(compare_selection))
+
+        if len(compare_names) < 2:
+            st.info("Select at least two districts to compare.")
+        else:
+            df_compare, df_compare_positions = compare_districts(compare_names)
+
+            # The comparison table below has the same numbers as the charts
+
+            if not lite:
+                st.subheader("Adequacy Level")
+                st.plotly_chart(comparison_adequacy_figure(compare_names), width="stretch", key="compare_adequacy_chart")
+
+                st.subheader("Adequate and Current Funding")
+                compare_per_student = st.toggle("Show per student", key="compare_per_student")
+                st.plotly_chart(comparison_funding_figure(compare_names, compare_per_student), width="stretch", key="compare_funding_chart")
+
+                st.subheader("Staffing Surplus (Gaps) by Position")
+                compare_resource = st.selectbox("Select a position:", list(RESOURCE_COLUMNS), key="compare_resource")
+                st.plotly_chart(comparison_positions_figure(compare_names, compare_resource), width="stretch", key="compare_positions_chart")
+
+            st.subheader("Comparison Table")
+            st.markdown("Click a column header to sort.")
+
+            show_table(df_compare, "compare")
+            st.markdown("""<sub><b>Note:</b> Negative values represent funding and position gaps.</sub>""",unsafe_allow_html=True)
+
+if tab_map.open:
+    table_wide, table_leg = load_data()
+
+    with tab_map:
+        st.markdown("""<h4>Statewide Map</h4> 
+
+See how every school district, House district, or Senate district compares. Click a district on the map to select it in the “School District View” (school districts) or “Legislative View” (House and Senate districts) tab.
+                                
+""",unsafe_allow_html=True) 
+
+        if lite:
+            st.info("The statewide map is not available in the lite version. Switch to the full version at the top of the page to see it.")
+        else:
+            map_layer = st.selectbox("Map:", list(MAP_LAYERS), format_func=lambda layer: MAP_LAYERS[layer][0], key="map_layer")
+            map_metric = st.selectbox("Color districts by:", list(MAP_METRICS), key="map_metric")
+            map_level = st.radio("Map detail:", list(MAP_DETAIL_LEVELS), format_func=lambda level: MAP_DETAIL_LEVELS[level][0], horizontal=True, key="map_detail")
+
+            fig_map = load_map_figure(table_wide, table_leg, map_layer, map_metric, map_level)
+
+            if fig_map is None:
+                st.info("The map has not been built yet. Run `python peer_build.py maps` to create the district boundaries.")
+            else:
+                st.plotly_chart(fig_map, key="district_map", on_select=select_from_map, selection_mode="points", width="stretch")
+                st.markdown("""<sub><b>Note:</b> Negative values represent funding and position gaps. House and Senate district values weight each school district by the share of its students who live in the legislative district.</sub>""",unsafe_allow_html=True)
+
+if tab2.open:
+    table_wide, table_leg = load_data()
+
+    with tab2:
+        st.markdown("""<h4>Legislative View</h4> 
 
 Look up information about adequate funding and district demographics by legislative district. Search by:
                 
@@ -790,172 +759,78 @@ Look up information about adequate funding and district demographics by legislat
                                 
 """,unsafe_allow_html=True) 
     
-    # Filter options
-    filter_type = st.radio(
-        "Filter by:",
-        ["Chamber & District", "Legislator Name"]
-    )
+        # Filter options
+        filter_type = st.radio(
+            "Filter by:",
+            ["Chamber & District", "Legislator Name"],
+            key="leg_filter_type"
+        )
     
-    if filter_type == "Chamber & District":
-        # Chamber selection
-        chambers = sorted(df_leg['Chamber'].unique())
-        selected_chamber = st.selectbox("Select ILGA Chamber:", chambers)
+        if filter_type == "Chamber & District":
+            # Chamber selection
+            chambers = leg_chambers(table_leg)
+            selected_chamber = st.selectbox("Select ILGA Chamber:", chambers, key="leg_chamber")
         
-        # District selection (filtered by chamber)
-        available_districts = sorted(df_leg[df_leg['Chamber'] == selected_chamber]['District Number'].unique())
-        selected_district = st.selectbox("Select by District:", available_districts)
+            # District selection (filtered by chamber)
+            available_districts = leg_district_numbers(table_leg, selected_chamber)
+            selected_district = st.selectbox("Select by District:", available_districts, key="leg_district")
         
-        # Filter data
-        filtered_df = df_leg[(df_leg['Chamber'] == selected_chamber) & (df_leg['District Number'] == selected_district)]
+            # Filter data
+            filtered_leg = filter_leg(table_leg, chamber=selected_chamber, district_number=selected_district)
         
-        # Display selection
-        st.subheader(f"📊 {filtered_df['Legislator Name'].values[0]} ({selected_chamber} District {selected_district})")
-
-        df = filtered_df.merge(df,on="RCDTS",how="left")
+            # Display selection
+            st.subheader(f"📊 {filtered_leg['Legislator Name'][0].as_py()} ({selected_chamber} District {selected_district})")
 
-    elif filter_type == "Legislator Name":  # Filter by Legislator
-        # Legislator selection
-        legislators = sorted(df_leg['Legislator Name'].dropna().unique())
-        selected_legislator = st.selectbox("Select by Legislator:", legislators)
+        elif filter_type == "Legislator Name":  # Filter by Legislator
+            # Legislator selection
+            legislators = leg_legislators(table_leg)
+            selected_legislator = st.selectbox("Select by Legislator:", legislators)
         
-        # Filter data
-        filtered_df = df_leg[df_leg['Legislator Name'] == selected_legislator]
+            # Filter data
+            filtered_leg = filter_leg(table_leg, legislator=selected_legislator)
         
-        # Display selection
-        legislator_info = filtered_df.iloc[0]
-        st.subheader(f"📊 {selected_legislator} ({legislator_info['Chamber']} District {legislator_info['District Number']})")
+            # Display selection
+            legislator_info = filtered_leg.slice(0, 1).to_pylist()[0]
+            st.subheader(f"📊 {selected_legislator} ({legislator_info['Chamber']} District {legislator_info['District Number']})")
 
-        df = filtered_df.merge(df,on="RCDTS",how="left")    
-    
-    df_schools = df[['School District','Total Students','Share of Students']]
+            # Each legislator represents one district, so both filters share the same cached tables
 
-    st.subheader("School Districts Covered and Share of Students")
+            selected_chamber = legislator_info['Chamber']
+            selected_district = legislator_info['District Number']
 
-    st.dataframe(
-        df_schools.style.format({
-        "Total Students": "{:,.0f}",
-        "Share of Students": "{:.0%}"
-        }).set_properties(**{'text-align': 'center'}), hide_index=True)
-    
-    st.subheader("Adequacy Funding Surplus(Gaps) and Levels")
+        log_legislative_selection(selected_chamber, selected_district)
 
-    df_adequacy_stats = df[['School District','Adequacy Funding Gap',
-                            'Adequacy Funding Gap Per Student',
-                            'Adequacy Level']]
-    
-    df_adequacy_stats.columns = ['School District','Adequacy Funding Surplus/Gap',
-                            'Adequacy Funding Surplus/Gap Per Student',
-                            'Adequacy Level']
-    
-    df_adequacy_stats["Adequacy Funding Surplus/Gap Per Student"] = df_adequacy_stats["Adequacy Funding Surplus/Gap Per Student"] = df_adequacy_stats["Adequacy Funding Surplus/Gap Per Student"] * -1
-
-    st.dataframe(
-        df_adequacy_stats.style.format({
-        "Adequacy Funding Surplus/Gap": "${:,.0f}",
-        "Adequacy Funding Surplus/Gap Per Student": "${:,.0f}",
-        "Adequacy Level": "{:.0%}" 
-        }).set_properties(**{'text-align': 'center'}), hide_index=True)
-    st.markdown("""<sub><b>Note:</b> Negative values represent funding gaps.""",unsafe_allow_html=True)
+        df_schools, df_adequacy_stats, df_adequacy_pos, df_demo, df_rev = legislative_arrow_tables(selected_chamber, selected_district)
+
+        st.subheader("School Districts Covered and Share of Students")
+
+        show_table(df_schools, "leg_schools")
     
-    st.subheader("Adequacy Funding Gaps by Position")
-
-    df_adequacy_pos = df[['School District','Core and Specialist Teachers Gap (EIS)',
-                          'Special Education Teachers Gap (EIS)', 
-                          'Counselors Gap (IRC)',
-                          'Nurses Gap (IRC)', 
-                          'Psychologists Gap (IRC)', 
-                          'Principals Gap (EIS)',
-                          'Assistant Principals Gap (EIS)', 
-                          'EL Teachers Gap (EIS)']]
-
-    df_adequacy_pos.columns = ['School District',
-                               'Core and Specialist Teachers',
-                               'Special Education Teachers', 
-                               'Counselors',
-                               'Nurses', 
-                               'Psychologists', 
-                               'Principals',
-                               'Assistant Principals', 
-                               'EL Teachers']
-
-    st.dataframe(
-        df_adequacy_pos.style.format({
-        'Core and Specialist Teachers': "{:,.0f}",
-        'Special Education Teachers': "{:,.0f}",
-        'Counselors': "{:,.0f}",
-        'Nurses': "{:,.0f}",
-        'Psychologists': "{:,.0f}",
-        'Principals': "{:,.0f}",
-        'Assistant Principals': "{:,.0f}",
-        'EL Teachers': "{:,.0f}", 
-        }).set_properties(**{'text-align': 'center'}), hide_index=True)
-
-    st.subheader("Demographics")
-
-    df_demo = df[['School District',
-                  'White (%)',
-                  'Black (%)',
-                  'Latine (%)',
-                  'Asian (%)',
-                  'Native Hawaiian or Other Pacific Islander (%)',
-                  'American Indian or Alaska Native (%)',
-                  'IEP (%)',
-                  'EL (%)',
-                  'Low Income (%)']]
-
-    df_demo.columns = ['School District',
-                  'White',
-                  'Black',
-                  'Latine',
-                  'Asian',
-                  'Native Hawaiian or Other Pacific Islander',
-                  'American Indian or Alaska Native',
-                  'IEP',
-                  'EL',
-                  'Low Income']
-
-    st.dataframe(
-        df_demo.style.format({
-            'White':"{:.1%}",
-            'Black':"{:.1%}",
-            'Latine':"{:.1%}",
-            'Asian':"{:.1%}",
-            'Native Hawaiian or Other Pacific Islander':"{:.1%}",
-            'American Indian or Alaska Native':"{:.1%}",
-            'IEP':"{:.1%}",
-            'EL':"{:.1%}",
-            'Low Income':"{:.1%}"
-            }).set_properties(**{'text-align': 'center'}), hide_index=True)
-
-    st.subheader("Revenue Sources")
-
-    df_rev = df[['School District',
-                  'Local Property Taxes (%)', 
-                  'Other Local Funding (%)',
-                  'Evidence-Based Funding (%)', 
-                  'Other State Funding (%)',
-                  'Federal Funding (%)']]
-
-    df_rev.columns = ['School District',
-                  'Local Property Taxes', 
-                  'Other Local Funding',
-                  'Evidence-Based Funding', 
-                  'Other State Funding',
-                  'Federal Funding']
+        st.subheader("Adequacy Funding Surplus(Gaps) and Levels")
+
+        show_table(df_adequacy_stats, "leg_adequacy")
+        st.markdown("""<sub><b>Note:</b> Negative values represent funding gaps.""",unsafe_allow_html=True)
     
+        st.subheader("Adequacy Funding Gaps by Position")
 
-    st.dataframe(
-        df_rev.style.format({
-            'Local Property Taxes':"{:.1%}",
-            'Other Local Funding':"{:.1%}",
-            'Evidence-Based Funding':"{:.1%}",
-            'Other State Funding':"{:.1%}",
-            'Federal Funding':"{:.1%}"
-            }).set_properties(**{'text-align': 'center'}), hide_index=True)
+        show_table(df_adequacy_pos, "leg_positions")
 
+        st.subheader("Demographics")
 
-with tab3:
-    st.markdown("""<h4>About the Tool</h4> 
+        show_table(df_demo, "leg_demographics")
+
+        st.subheader("Revenue Sources")
+
+        show_table(df_rev, "leg_revenue")
+
+        st.subheader("Download")
+
+        download_buttons(legislative_export, (selected_chamber, selected_district), f"{selected_chamber} District {selected_district}", "leg_download")
+
+
+if tab3.open:
+    with tab3:
+        st.markdown("""<h4>About the Tool</h4> 
 
 This tool is meant to help families, students, educators, and advocates understand resource inequity in Illinois. Our goals are to:
 
@@ -964,7 +839,7 @@ This tool is meant to help families, students, educators, and advocates understa
                                 
 """,unsafe_allow_html=True) 
 
-    st.markdown("""<h4>About the Data</h4> 
+        st.markdown("""<h4>About the Data</h4> 
 
 All data comes from the Illinois State Board of Education and represents the most recent data available. This is why the years for the datasets do not always match. 
 
@@ -980,7 +855,10 @@ Used to calculate students in legislative districts as a percentage of their res
 <sub><b>Note:</b> For dollar-amount adequacy gaps (referred to as the <i>school funding gap</i> in the <b>School District View</b> tab), we use the EBF Distribution Calculation. For adequate position gaps, we subtract the actual positions (from the Illinois Report Card and Educator Employment Information) from the adequate staffing levels provided in the EBF Distribution Calculation. <b> Demographics </b> do not add up to 100%. Racial groups, low-income students, IEP students, and English Learner students are grouped separately. Racial groups do not add up to 100 percent because the "two or more races" category was exlude. The other groups are percentages of their own group. For example, low-income students are a percentage of low-income and non-low-income students. </sub>                                               
                 """,unsafe_allow_html=True)
 
-    st.markdown("""<h4>About PEER Illinois</h4> 
+        st.markdown("""Download the data for every Illinois school district used in this tool:""",unsafe_allow_html=True)
+        download_buttons(statewide_export, (), "Illinois school districts", "statewide_download")
+
+        st.markdown("""<h4>About PEER Illinois</h4> 
 
 The Partnership for Equity and Education Rights (PEER) Illinois is a statewide advocacy network dedicated to driving increased investment in our children. We strive to ensure our kids have the resources and opportunities they need to succeed in public schools and beyond.
 
@@ -0,0 +1,216 @@
+# Build step for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Produce the derived files that peer_app.py serves so the app never
+#           has to do heavy processing while a visitor is waiting.
+#
+# Usage:
+#
+#   python peer_build.py sources --ebf FY26-EBF-Full-Calc.xlsx
+#                                --irc 2025-Report-Card-Public-Data-Set.xlsx
+#                                --eis 2024-ATSB-Report.xlsx
+#
+#   python peer_build.py crosswalk --schools school_enrollment.csv
+#
+#   python peer_build.py arrow
+#
+#   python peer_build.py lite
+#
+#   python peer_build.py refresh --previous app_data_wide.previous.parquet
+#
+#   python peer_build.py maps --unified unified.shp --elementary elementary.shp
+#                             --secondary secondary.shp --district-id-col RCDTS
+#                             --house house.shp --senate senate.shp --leg-id-col DISTRICT
+#
+# Boundary files can be any format geopandas reads (shapefile, GeoPackage,
+# GeoJSON). Census TIGER school district files identify districts by NCES ID;
+# pass --district-id-map with a two column CSV (NCES ID, RCDTS) built from the
+# Directory of Educational Entities to translate them to RCDTS.
+#
+# Run the sources stage on newly downloaded ISBE workbooks before running the
+# data cleaning notebook. It checks every sheet the notebook reads against its
+# schema in peer_sources.py and stops with the differences if ISBE moved or
+# renamed a column. The EBF column headings are checked against
+# source_headers.lock.json; --update-lock records new ones to review and commit.
+# The repository has no lock file yet, so run it with --update-lock once first.
+#
+# The crosswalk stage is run by hand after new enrollment, redistricting, or a
+# change to leg_roster.csv; no other stage runs it. It skips the rebuild of
+# leg_dist_coverage.csv when its inputs haven't changed (see peer_crosswalk.py)
+# and rewrites the Arrow copies when it does rebuild.
+#
+# After the data cleaning notebook writes new data, run the refresh stage
+# instead of the arrow and lite stages. It reports what changed since the
+# previous data and rebuilds only what the changes affect (see peer_refresh.py).
+#
+# Re-run the arrow stage every time app_data_wide.parquet or
+# leg_dist_coverage.csv changes, then the lite stage to render the lite mode
+# charts of every district into the disk cache (see peer_lite.py). Run it
+# where the app runs, or with PEER_CACHE_DIR set to the app's cache directory.
+
+import argparse
+import sys
+
+import peer_crosswalk
+import peer_data
+import peer_maps
+import peer_sources
+
+
+def build_sources(args):
+    """Check the ISBE workbooks against the schemas the cleaning notebook reads them with"""
+    paths = {name: getattr(args, name) for name in ["ebf", "irc", "eis"] if getattr(args, name)}
+    if not paths:
+        sys.exit("Pass at least one of --ebf, --irc or --eis")
+    try:
+        frames = peer_sources.read_sources(paths, lock_path=args.lock, update_lock=args.update_lock)
+    except peer_sources.SchemaError as e:
+        sys.exit(f"Schema check failed. {e}")
+    for source, df in frames.items():
+        print(f"{source}: {len(df)} rows, {len(df.columns)} columns")
+        spec = peer_sources.SOURCES[source]
+        empty = [name for name in (spec["columns"][h][0] for h in spec.get("optional", [])) if df[name].isna().all()]
+        if empty:
+            print(f"  WARNING: no values for optional column(s): {', '.join(empty)}. Check their headings in peer_sources.py")
+    if args.update_lock:
+        print(f"Saved the EBF column headings to {args.lock}; review the change with git diff and commit it")
+
+
+def build_crosswalk(args):
+    """Rebuild the legislative district crosswalk from school-level enrollment"""
+    columns = {key: getattr(args, f"{key}_col") for key in peer_crosswalk.SCHOOL_COLUMNS}
+    try:
+        df = peer_crosswalk.write_crosswalk(args.schools, args.roster, args.output, columns, force=args.force)
+    except ValueError as e:
+        sys.exit(str(e))
+    if df is None:
+        print(f"{args.output} is up to date")
+        return
+    print(f"Wrote {args.output}: {len(df)} rows, {df['RCDTS'].nunique()} school districts")
+    unnamed = df.loc[df["Legislator Name"].isna(), ["Chamber", "District Number"]].drop_duplicates()
+    if len(unnamed):
+        print(f"No legislator in {args.roster} for {len(unnamed)} district(s): "
+              + ", ".join(f"{c} {n}" for c, n in unnamed.itertuples(index=False)))
+    if args.output == peer_data.LEG_CSV:
+        build_arrow(args)
+
+
+def build_arrow(args):
+    """Write memory-mappable Arrow copies of the app data"""
+    for path in peer_data.write_arrow_files():
+        print(f"Wrote {path}")
+
+
+def build_lite(args):
+    """Render the lite mode charts of every district into the disk cache"""
+
+    # Imported here so the other stages don't load streamlit. Its cache
+    # decorators warn about running outside `streamlit run`.
+
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    import peer_lite
+    print(f"Rendered lite charts for {peer_lite.prerender_lite_charts()} districts")
+
+
+def build_refresh(args):
+    """Report what changed since the previous data and rebuild only what it affects"""
+
+    # Imported here so the other stages don't load streamlit
+
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    import peer_refresh
+    summary = peer_refresh.refresh(args.previous, args.previous_leg, args.threshold, args.report)
+    report = summary["report"]
+    for change, count in report["Change"].value_counts().items():
+        print(f"{change}: {count}")
+    if args.report:
+        print(f"Wrote {args.report}")
+    print(f"{summary['changed_districts']} school districts and {summary['changed_legislative']} legislative districts changed")
+    print(f"Carried forward {summary['kept']} cached results, dropped {summary['dropped']}, rendered lite charts for {summary['rendered']} districts")
+
+
+def build_maps(args):
+    """Simplify school and legislative district boundaries for the map tab"""
+    written = []
+    school_layers = {
+        "elementary": [args.unified, args.elementary],
+        "high_school": [args.unified, args.secondary],
+    }
+    for layer, paths in school_layers.items():
+        paths = [p for p in paths if p]
+        if paths:
+            written += peer_maps.build_map_layer(layer, paths, args.district_id_col, args.district_id_map, args.map_dir)
+    for layer in ["house", "senate"]:
+        path = getattr(args, layer)
+        if path:
+            written += peer_maps.build_map_layer(layer, [path], args.leg_id_col, map_dir=args.map_dir)
+    for path in written:
+        print(f"Wrote {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build derived data files for the PEER Illinois Funding Tool")
+    stages = parser.add_subparsers(dest="stage", required=True)
+
+    # ISBE source workbooks
+
+    sources = stages.add_parser("sources", help="Check the ISBE workbooks against their schemas")
+    sources.add_argument("--ebf", help="EBF Full Calc workbook")
+    sources.add_argument("--irc", help="Illinois Report Card public data set workbook")
+    sources.add_argument("--eis", help="EIS Administrator and Teacher Salary and Benefits workbook")
+    sources.add_argument("--lock", default=peer_sources.HEADER_LOCK, help="Saved EBF column headings to compare against")
+    sources.add_argument("--update-lock", action="store_true", help="Save the current EBF column headings to the lock file instead of checking them")
+    sources.set_defaults(func=build_sources)
+
+    # Legislative district crosswalk
+
+    crosswalk = stages.add_parser("crosswalk", help="Rebuild leg_dist_coverage.csv from school-level enrollment")
+    crosswalk.add_argument("--schools", required=True, help="School enrollment with House and Senate districts (CSV or Excel)")
+    crosswalk.add_argument("--roster", default=peer_crosswalk.ROSTER_CSV, help="Legislator names by chamber and district number")
+    crosswalk.add_argument("--output", default=peer_data.LEG_CSV)
+    for key, col in peer_crosswalk.SCHOOL_COLUMNS.items():
+        crosswalk.add_argument(f"--{key}-col", default=col, help=f"Column holding the school {key} (default: {col})")
+    crosswalk.add_argument("--force", action="store_true", help="Rebuild even if the inputs haven't changed")
+    crosswalk.set_defaults(func=build_crosswalk)
+
+    # Arrow copies of the app data
+
+    arrow = stages.add_parser("arrow", help="Write memory-mapped Arrow copies of the app data")
+    arrow.set_defaults(func=build_arrow)
+
+    # Lite mode charts
+
+    lite = stages.add_parser("lite", help="Render the lite mode charts into the disk cache")
+    lite.set_defaults(func=build_lite)
+
+    # Refresh after new data
+
+    refresh = stages.add_parser("refresh", help="Report changes since the previous data and rebuild what they affect")
+    refresh.add_argument("--previous", required=True, help="The previous app_data_wide.parquet")
+    refresh.add_argument("--previous-leg", default=peer_data.LEG_CSV, help="The previous leg_dist_coverage.csv (default: unchanged)")
+    refresh.add_argument("--threshold", type=float, default=0.05, help="Report metrics whose relative change is larger than this")
+    refresh.add_argument("--report", default="data_changes.csv", help="Change report CSV")
+    refresh.set_defaults(func=build_refresh)
+
+    # Map geometries
+
+    maps = stages.add_parser("maps", help="Simplify district boundaries for the statewide map")
+    maps.add_argument("--unified", help="Unified school district boundaries")
+    maps.add_argument("--elementary", help="Elementary school district boundaries")
+    maps.add_argument("--secondary", help="High school (secondary) district boundaries")
+    maps.add_argument("--district-id-col", default="RCDTS", help="Column holding the district id in the school district files")
+    maps.add_argument("--district-id-map", help="Optional CSV mapping the school district file id to RCDTS")
+    maps.add_argument("--house", help="Illinois House district boundaries")
+    maps.add_argument("--senate", help="Illinois Senate district boundaries")
+    maps.add_argument("--leg-id-col", default="DISTRICT", help="Column holding the district number in the legislative files")
+    maps.add_argument("--map-dir", default=peer_maps.MAP_DIR)
+    maps.set_defaults(func=build_maps)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
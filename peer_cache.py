@@ -0,0 +1,287 @@
+# Persistent result cache for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Keep computed results on disk so app restarts, redeploys and other
+#           replicas reuse them instead of recomputing every district.
+#
+# NOTE on keys and invalidation.
+#
+# Results are stored under <cache dir>/<data version>/<function>/<key>.pkl.
+# The data version is a content hash of the data files the app actually reads
+# (the Arrow copies, or app_data_wide.parquet and leg_dist_coverage.csv before
+# the copies are built), so new data gets a fresh cache and stale numbers are
+# never served. A new parquet file only takes effect once the Arrow copies are
+# rebuilt. The key is a hash of the function arguments (a district name, a
+# legislator, ...).
+#
+# The in-memory caches in front of the disk cache (st.cache_data) are keyed by
+# arguments only; peer_app.py clears them when the data version changes.
+#
+# The cache directory can be shared by every app process on a machine (or a
+# mounted volume shared by replicas). Writes go to a temporary file that is
+# renamed into place, so readers never see half-written results.
+#
+# Settings (environment variables):
+#
+# PEER_CACHE_DIR      cache directory (default ".peer_cache")
+# PEER_CACHE_MAX_MB   size limit before least recently used results are
+#                     deleted (default 512)
+#
+# NOTE on eviction.
+#
+# Each process keeps a running total of the cache size and only scans the
+# cache directory when the total crosses the limit, then deletes results down
+# to EVICT_TO of the limit. Writes by other processes are counted at the next
+# scan.
+
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+
+
+CACHE_DIR = os.environ.get("PEER_CACHE_DIR", ".peer_cache")
+CACHE_MAX_BYTES = int(os.environ.get("PEER_CACHE_MAX_MB", "512")) * 1024 * 1024
+EVICT_TO = 0.9
+
+_file_hashes = {}
+_cache_sizes = {}
+
+
+# Data version
+
+def _file_hash(path):
+    """Content hash of a file, recomputed only when its size or modified time changes"""
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    cached = _file_hashes.get(path)
+    if cached is None or cached[0] != stamp:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        cached = (stamp, digest.hexdigest())
+        _file_hashes[path] = cached
+    return cached[1]
+
+
+def data_version(paths=None):
+    """Short hash identifying the current contents of the app data files"""
+
+    # Imported here so the app's first page doesn't load pyarrow (see peer_profile.py)
+
+    if paths is None:
+        from peer_data import served_files
+        paths = served_files()
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(_file_hash(path).encode())
+    return digest.hexdigest()[:16]
+
+
+# Reading and writing
+
+def _entry_path(func_name, args, version, cache_dir):
+    key = hashlib.sha256(repr(args).encode()).hexdigest()[:32]
+    return os.path.join(cache_dir, version, func_name, f"{key}.pkl")
+
+
+def _read_entry(path):
+    """Return (args, value) from a cache file, or None if it is missing or unreadable"""
+    try:
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # A damaged file is treated as a miss and removed
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    # Mark as recently used for eviction
+
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry
+
+
+def _write_entry(path, args, value):
+    """Atomically write (args, value) to a cache file; return its size"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((args, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        os.replace(tmp_path, path)
+        return size
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def cache_get(func_name, args, version=None, cache_dir=None):
+    """Return (True, value) for a cached result or (False, None) for a miss"""
+    cache_dir = cache_dir or CACHE_DIR
+    path = _entry_path(func_name, args, version or data_version(), cache_dir)
+    entry = _read_entry(path)
+    if entry is None:
+        return False, None
+    return True, entry[1]
+
+
+def cache_set(func_name, args, value, version=None, cache_dir=None):
+    """Store a result and evict old results if the cache is over its size limit"""
+    cache_dir = cache_dir or CACHE_DIR
+    version = version or data_version()
+    size = _write_entry(_entry_path(func_name, args, version, cache_dir), args, value)
+    _track_size(size, version, cache_dir)
+
+
+def cache_set_many(func_name, items, version=None, cache_dir=None):
+    """Store many (args, value) results, checking the size limit once at the end"""
+    cache_dir = cache_dir or CACHE_DIR
+    version = version or data_version()
+    size = sum(_write_entry(_entry_path(func_name, args, version, cache_dir), args, value) for args, value in items)
+    _track_size(size, version, cache_dir)
+
+
+# Eviction
+
+def _track_size(added, version, cache_dir):
+    """Add written bytes to the running cache size and evict once it crosses the limit"""
+    if cache_dir in _cache_sizes:
+        _cache_sizes[cache_dir] += added
+    else:
+        # The first scan already includes the results just written
+        _cache_sizes[cache_dir] = sum(size for _, _, size, _ in _cache_files(cache_dir))
+    if _cache_sizes[cache_dir] > CACHE_MAX_BYTES:
+        evict(int(CACHE_MAX_BYTES * EVICT_TO), version, cache_dir)
+
+
+def _cache_files(cache_dir):
+    """List (path, version, size, last used) for every cached result"""
+    files = []
+    if not os.path.isdir(cache_dir):
+        return files
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            version = os.path.relpath(path, cache_dir).split(os.sep)[0]
+            files.append((path, version, stat.st_size, stat.st_mtime))
+    return files
+
+
+def evict(max_bytes=None, version=None, cache_dir=None):
+    """Delete results until the cache fits in max_bytes.
+
+    Results from older data versions go first, then the least recently used.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    files = _cache_files(cache_dir)
+    total = sum(size for _, _, size, _ in files)
+    _cache_sizes[cache_dir] = total
+    if total <= max_bytes:
+        return 0
+
+    files.sort(key=lambda f: (f[1] == version, f[3]))
+    removed = 0
+    for path, _, size, _ in files:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except FileNotFoundError:
+            pass
+    _cache_sizes[cache_dir] = total
+    return removed
+
+
+def clear_stale_versions(version=None, cache_dir=None):
+    """Delete the cache directories of every data version except the current one"""
+    cache_dir = cache_dir or CACHE_DIR
+    version = version or data_version()
+    if not os.path.isdir(cache_dir):
+        return []
+    stale = [name for name in os.listdir(cache_dir) if name != version and os.path.isdir(os.path.join(cache_dir, name))]
+    for name in stale:
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    _cache_sizes.pop(cache_dir, None)
+    return stale
+
+
+def carry_forward(old_version, keep, version=None, cache_dir=None):
+    """Copy results of an older data version that are still correct into the current one.
+
+    keep(func_name, args) returns True for results whose inputs did not change
+    between the versions. Files are hard linked where the file system allows.
+    Returns the number of results kept and dropped.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    version = version or data_version()
+    old_dir = os.path.join(cache_dir, old_version)
+    kept = dropped = 0
+    if old_version == version or not os.path.isdir(old_dir):
+        return kept, dropped
+    for func_name in os.listdir(old_dir):
+        for name in os.listdir(os.path.join(old_dir, func_name)):
+            path = os.path.join(old_dir, func_name, name)
+            entry = _read_entry(path) if name.endswith(".pkl") else None
+            if entry is None:
+                continue
+            if not keep(func_name, entry[0]):
+                dropped += 1
+                continue
+            new_path = os.path.join(cache_dir, version, func_name, name)
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            if not os.path.exists(new_path):
+                try:
+                    os.link(path, new_path)
+                except OSError:
+                    shutil.copy2(path, new_path)
+            kept += 1
+    _cache_sizes.pop(cache_dir, None)
+    return kept, dropped
+
+
+# Decorator
+
+def disk_cache(func):
+    """Cache a function's results on disk, keyed by data version and arguments.
+
+    Arguments must have a stable repr (strings, numbers, tuples). Put this
+    below @st.cache_data so the in-memory cache is checked first; that cache
+    doesn't know the data version, so the app clears it when the version
+    changes (peer_app.clear_stale_caches).
+    """
+    func_name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key_args = args + tuple(sorted(kwargs.items()))
+        version = data_version()
+        hit, value = cache_get(func_name, key_args, version)
+        if hit:
+            return value
+        value = func(*args, **kwargs)
+        cache_set(func_name, key_args, value, version)
+        return value
+
+    return wrapper
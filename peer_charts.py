@@ -0,0 +1,249 @@
+# Charts for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Build the School District View charts once per district and cache
+#           them in memory and on disk (see peer_cache.py), and the Compare
+#           Districts charts once per set of districts.
+#
+# NOTE on imports.
+#
+# plotly.express is imported inside each chart function, so it is only
+# loaded when a chart is first built, not when the app starts (see
+# peer_profile.py).
+
+import streamlit as st
+
+from peer_cache import disk_cache
+from peer_metrics import calculate_funding_metrics, compare_districts
+
+
+@st.cache_data
+@disk_cache
+def revenue_figure(district_name):
+    """Bar chart of a district's revenue by source"""
+    import plotly.express as px
+
+    df_revenue = calculate_funding_metrics(district_name)[5]
+    df_revenue = df_revenue.sort_values('Revenue Percentages', ascending=False)
+
+    # Create a bar chart for revenue sources
+
+    fig_rev = px.bar(
+        df_revenue,
+        x='Revenue Source',
+        y='Revenue Percentages',
+        color='Revenue Source',
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        labels={'Revenue Percentages': 'Percent of Total Revenue (%)', 'Revenue Source': ''},
+        text='Revenue Percentages'
+    )
+
+    # Format the chart
+
+    fig_rev.update_traces(
+
+        # Format the text labels to show percentages
+
+        texttemplate='%{text:.0%}',
+        textposition='outside',
+        hovertemplate='%{y:.2%}<extra></extra>'
+    )
+
+    # Calculate the max value to set y-axis range
+
+    max_revenue = df_revenue['Revenue Percentages'].max()
+    y_rev_max = max_revenue * 1.3  # 30% higher than max value
+
+    fig_rev.update_layout(
+        title="",
+        showlegend=False,
+        xaxis_title="",
+        yaxis_title="Percent of Total Revenue (%)",
+        height=600,
+        margin=dict(t=80),
+        transition_duration=500,
+        transition_easing="cubic-in-out",
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='#141554'),
+        xaxis=dict(
+            tickangle=90,
+            tickfont=dict(color='#141554', size=12),
+            color='#141554',
+            automargin=True
+        ),
+        yaxis=dict(
+            tickformat='.0%',
+            range=[0, y_rev_max],
+            tickfont=dict(color='#141554', size=12),
+            color='#141554'
+        )
+    )
+    fig_rev.update_yaxes(title_font_color='#141554')
+    return fig_rev
+
+
+@st.cache_data
+@disk_cache
+def demographics_figure(district_name):
+    """Bar chart of a district's student demographics"""
+    import plotly.express as px
+
+    df_demographics = calculate_funding_metrics(district_name)[4]
+
+    # Create a bar chart for demographics
+
+    fig_demo = px.bar(
+        df_demographics,
+        x='Demographic Group',
+        y='Demographic Percentages',
+        color='Demographic Group',
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        labels={'Demographic Percentages': 'Percentage of Students (%)', 'Demographic Group': ''},
+        text='Demographic Percentages',
+        title="Student Demographics"
+    )
+
+    # Format the chart
+
+    fig_demo.update_traces(
+        texttemplate='%{text:.0%}',
+        textposition='outside',
+        textfont=dict(size=12, color='#141554', family='Poppins'),
+        hovertemplate='%{y:.2%}<extra></extra>'
+    )
+
+    # Calculate max value and set y-axis range
+
+    max_demographic = df_demographics['Demographic Percentages'].max()
+    y_demo_max = max_demographic * 1.3  # 30% higher than max value
+
+    fig_demo.update_layout(
+        showlegend=False,
+        title="",
+        title_x=0.5,
+        title_font_size=20,
+        xaxis_title="",
+        yaxis_title="Percentage of Students (%)",
+        margin=dict(t=80),
+        height=600,
+        transition_duration=1000,
+        transition_easing="cubic-in-out",
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='#141554'),
+        xaxis=dict(
+            tickangle=90,
+            tickfont=dict(color='#141554', size=12),
+            color='#141554',
+            automargin=True
+        ),
+        yaxis=dict(
+            tickformat='.0%',
+            range=[0, y_demo_max],
+            tickfont=dict(color='#141554', size=12),
+            color='#141554'
+        )
+    )
+    fig_demo.update_yaxes(title_font_color='#141554')
+    return fig_demo
+
+
+# District comparison charts
+
+def _comparison_layout(fig, height, yaxis_title, tickformat):
+    """Shared formatting for the comparison charts"""
+    fig.update_layout(
+        title="",
+        xaxis_title="",
+        yaxis_title=yaxis_title,
+        height=height,
+        margin=dict(t=40),
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(color='#141554'),
+        legend_title_text="",
+        xaxis=dict(
+            tickangle=90,
+            tickfont=dict(color='#141554', size=12),
+            color='#141554',
+            automargin=True
+        ),
+        yaxis=dict(
+            tickformat=tickformat,
+            tickfont=dict(color='#141554', size=12),
+            color='#141554'
+        )
+    )
+    fig.update_yaxes(title_font_color='#141554')
+    return fig
+
+
+@st.cache_data
+def comparison_adequacy_figure(district_names):
+    """Adequacy level of each compared district, with the 100% adequacy line"""
+    import plotly.express as px
+
+    df_summary = compare_districts(district_names)[0].sort_values("Adequacy Level")
+    df_summary["Funding"] = df_summary["Adequacy Level"].map(lambda level: "At or above adequacy" if level >= 1 else "Below adequacy")
+
+    fig = px.bar(
+        df_summary,
+        x="School District",
+        y="Adequacy Level",
+        color="Funding",
+        color_discrete_map={"Below adequacy": "#C4384D", "At or above adequacy": "#20a3bc"},
+        text="Adequacy Level"
+    )
+    fig.update_traces(texttemplate='%{text:.0%}', textposition='outside', hovertemplate='%{x}: %{y:.1%}<extra></extra>')
+    fig.add_hline(y=1, line_dash="dash", line_color="#141554")
+    return _comparison_layout(fig, 500, "Adequacy Level (%)", '.0%')
+
+
+@st.cache_data
+def comparison_funding_figure(district_names, per_student=False):
+    """Grouped bars of adequate and actual funding for each compared district"""
+    import plotly.express as px
+
+    df_summary = compare_districts(district_names)[0]
+    suffix = " Per Student" if per_student else ""
+    df_long = df_summary.melt(
+        id_vars=["School District"],
+        value_vars=[f"Adequacy Target{suffix}", f"Actual Resources{suffix}"],
+        var_name="Funding",
+        value_name="Dollars"
+    )
+    df_long["Funding"] = df_long["Funding"].map({f"Adequacy Target{suffix}": "Adequate Funding", f"Actual Resources{suffix}": "Current Funding"})
+
+    fig = px.bar(
+        df_long,
+        x="School District",
+        y="Dollars",
+        color="Funding",
+        barmode="group",
+        color_discrete_map={"Adequate Funding": "#141554", "Current Funding": "#20a3bc"}
+    )
+    fig.update_traces(hovertemplate='%{x}: $%{y:,.0f}<extra></extra>')
+    return _comparison_layout(fig, 500, f"Dollars{suffix}", '$,.0f')
+
+
+@st.cache_data
+def comparison_positions_figure(district_names, resource):
+    """Position surplus (gap) for one resource in each compared district"""
+    import plotly.express as px
+
+    df_positions = compare_districts(district_names)[1]
+    df_resource = df_positions[df_positions["Resource"] == resource].sort_values("Gap")
+    df_resource["Positions"] = df_resource["Gap"].map(lambda gap: "Surplus" if gap >= 0 else "Gap")
+
+    fig = px.bar(
+        df_resource,
+        x="School District",
+        y="Gap",
+        color="Positions",
+        color_discrete_map={"Gap": "#C4384D", "Surplus": "#20a3bc"},
+        text="Gap",
+        hover_data={"Adequate": ':.1f', "Actual": ':.1f', "Positions": False}
+    )
+    fig.update_traces(texttemplate='%{text:,.1f}', textposition='outside')
+    return _comparison_layout(fig, 500, f"{resource} Surplus (Gap)", ',.0f')
@@ -0,0 +1,136 @@
+# Staff compensation for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Average salary and benefits by district and position from the EIS
+#           Administrator and Teacher Salary and Benefits (ATSB) report, and
+#           conversions between dollars and positions for the "From Dollars to
+#           Desks" expander.
+#
+# NOTE on the compensation table.
+#
+# The data cleaning notebook averages salary plus benefits over the ATSB
+# records of each district and position once and writes the result to
+# app_data_compensation.parquet (one row per district and position). The app
+# never reads individual salary records. ATSB positions are grouped the same
+# way as the actual position counts in peer_adequacy.py (POSITIONS), so
+# counselors, nurses, and psychologists, which are counted from the Illinois
+# Report Card, have no compensation data.
+#
+# The Salary and Benefits headings haven't been checked against an ATSB
+# workbook (see peer_sources.py). If they are missing those columns are empty
+# and the table has no rows. write_compensation_parquet refuses to write an
+# empty table, since the app would take it as built and never show a cost.
+#
+# NOTE on districts without records.
+#
+# A district with no ATSB records for a position uses the statewide average
+# for that position, which is also the State of Illinois row.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from peer_adequacy import POSITIONS
+from peer_data import STATE_RCDTS, district_rcdts
+
+
+COMPENSATION_PARQUET = "app_data_compensation.parquet"
+
+# ATSB PositionCodeDescription -> position label used in the app (the label
+# is the gap column without " Gap (EIS)", as in peer_metrics.RESOURCE_COLUMNS)
+
+EIS_POSITIONS = {
+    source[len("EIS "):]: gap.replace(" Gap (EIS)", "")
+    for _, _, _, sources, gap, _, _ in POSITIONS
+    for source in sources if source.startswith("EIS ")
+}
+
+COMPENSATION_POSITIONS = list(dict.fromkeys(EIS_POSITIONS.values()))
+
+
+# Build step (called from the data cleaning notebook)
+
+def compensation_table(eis):
+    """Average salary plus benefits by district and position from ATSB records.
+
+    Expects the "eis_positions" columns from read_sources (RCDTS,
+    PositionCodeDescription, EIS Salary, EIS Benefits). Returns RCDTS,
+    Resource, Average Compensation and Staff Records, including a State of
+    Illinois row per position.
+    """
+    df = pd.DataFrame({
+        "RCDTS": district_rcdts(eis["RCDTS"]).to_numpy(),
+        "Resource": eis["PositionCodeDescription"].map(EIS_POSITIONS).to_numpy(),
+        "Compensation": (eis["EIS Salary"].fillna(0) + eis["EIS Benefits"].fillna(0)).to_numpy(dtype=float),
+    })
+
+    # Records without a salary can't be averaged
+
+    df = df[df["Resource"].notna() & (df["Compensation"] > 0)]
+    statewide = df.assign(RCDTS=STATE_RCDTS)
+    return (pd.concat([df, statewide])
+            .groupby(["RCDTS", "Resource"], as_index=False)["Compensation"]
+            .agg(**{"Average Compensation": "mean", "Staff Records": "size"}))
+
+
+def write_compensation_parquet(df_compensation, path=COMPENSATION_PARQUET):
+    """Write the compensation table; raises ValueError if it is empty"""
+    if df_compensation.empty:
+        raise ValueError("The compensation table is empty: no ATSB record has a salary or benefits. Check the "
+                         "Salary and Benefits headings of \"eis_positions\" in peer_sources.py against the workbook")
+    df_compensation.to_parquet(path, index=False)
+    return path
+
+
+# Model
+
+def compensation_matrix(rcdts=None, path=COMPENSATION_PARQUET):
+    """Average compensation as a districts x positions frame (index RCDTS), or None if not built.
+
+    Pass rcdts to get rows for those districts in that order. Missing district
+    averages are filled with the statewide average.
+    """
+    if not os.path.exists(path):
+        return None
+    df = pd.read_parquet(path)
+    matrix = df.pivot(index="RCDTS", columns="Resource", values="Average Compensation").reindex(columns=COMPENSATION_POSITIONS)
+    if rcdts is not None:
+        matrix = matrix.reindex(rcdts)
+    if STATE_RCDTS in df["RCDTS"].values:
+        matrix = matrix.fillna(df[df["RCDTS"] == STATE_RCDTS].set_index("Resource")["Average Compensation"])
+    return matrix
+
+
+def dollars_to_positions(dollars, compensation):
+    """Positions a dollar amount pays for at the given compensation (arrays broadcast)"""
+    compensation = np.asarray(compensation, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(compensation > 0, np.asarray(dollars, dtype=float) / compensation, np.nan)
+
+
+def positions_to_dollars(positions, compensation):
+    """Cost of a number of positions at the given compensation (arrays broadcast)"""
+    return np.asarray(positions, dtype=float) * np.asarray(compensation, dtype=float)
+
+
+def funding_positions(dollars, matrix):
+    """Positions of each kind that a dollar amount per district pays for, for all districts at once.
+
+    dollars is a Series indexed by RCDTS; returns a districts x positions frame.
+    """
+    compensation = matrix.reindex(index=dollars.index)
+    return pd.DataFrame(dollars_to_positions(dollars.to_numpy(dtype=float)[:, None], compensation.to_numpy()),
+                        index=dollars.index, columns=compensation.columns)
+
+
+def gap_costs(gaps, matrix):
+    """Yearly cost of closing every position gap, for all districts at once.
+
+    gaps is a districts x positions frame of position gaps (index RCDTS,
+    negative = short). Surpluses cost nothing. Districts missing from the
+    compensation table are missing.
+    """
+    compensation = matrix.reindex(index=gaps.index, columns=gaps.columns)
+    return pd.DataFrame(positions_to_dollars(np.maximum(-gaps.to_numpy(dtype=float), 0), compensation.to_numpy()),
+                        index=gaps.index, columns=gaps.columns)
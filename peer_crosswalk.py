@@ -0,0 +1,158 @@
+# Legislative district crosswalk for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Rebuild leg_dist_coverage.csv from school-level enrollment with
+#           each school's House and Senate district, and attach legislator
+#           names from leg_roster.csv.
+#
+# Usage:
+#
+#   python peer_build.py crosswalk --schools school_enrollment.csv
+#
+# NOTE on the school file.
+#
+# One row per school with the school's RCDTS, its school district name, its
+# enrollment, and the House and Senate districts the school sits in (CSV or
+# Excel). The column names can be changed with the --*-col options. School
+# RCDTS codes are 15 characters (dashes and dropped leading zeros are fixed);
+# the district RCDTS used by the app is the first 11 characters followed by
+# "00", the same rule the data cleaning notebook uses for IRC school counts.
+#
+# NOTE on the crosswalk.
+#
+# Total Students is the school district's enrollment in schools inside the
+# legislative district. Share of Students is that enrollment as a share of the
+# school district's total enrollment, rounded to two decimals.
+#
+# NOTE on rebuilding.
+#
+# The crosswalk stage is a standalone step: neither the data cleaning notebook
+# nor the refresh stage runs it. Run it by hand after new enrollment,
+# redistricting, or a change to leg_roster.csv. The crosswalk is always
+# rebuilt in full; a stamp file next to it (leg_dist_coverage.stamp.json, not
+# committed) records a hash of the inputs and of the crosswalk it produced, and
+# the stage does nothing if neither has changed since the last run.
+
+import json
+import os
+
+import pandas as pd
+
+from peer_cache import data_version
+from peer_data import LEG_CSV, district_rcdts
+
+
+ROSTER_CSV = "leg_roster.csv"
+
+SCHOOL_COLUMNS = {
+    "rcdts": "RCDTS",
+    "name": "District Name",
+    "enrollment": "Enrollment",
+    "house": "House District",
+    "senate": "Senate District",
+}
+
+CROSSWALK_COLUMNS = ["Chamber", "District Number", "School District", "RCDTS", "Legislator Name",
+                     "Total Students", "Share of Students"]
+
+# Senate districts are listed first, as in the original crosswalk
+
+CHAMBER_ORDER = ["Senate", "House"]
+
+
+# Inputs
+
+def _read_table(path, **kwargs):
+    """Read a CSV or Excel file"""
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+        return pd.read_excel(path, **kwargs)
+    return pd.read_csv(path, **kwargs)
+
+
+def read_schools(path, columns=SCHOOL_COLUMNS):
+    """School enrollment in long format: one row per school and chamber"""
+    df = _read_table(path, dtype={columns["rcdts"]: str})
+    missing = [col for col in columns.values() if col not in df.columns]
+    if missing:
+        raise ValueError(f"{path} is missing column(s): {', '.join(missing)}")
+    df = pd.DataFrame({
+        "RCDTS": district_rcdts(df[columns["rcdts"]]),
+        "School District": df[columns["name"]].astype(str).str.strip(),
+        "Total Students": pd.to_numeric(df[columns["enrollment"]], errors="coerce").fillna(0),
+        "House": pd.to_numeric(df[columns["house"]], errors="coerce"),
+        "Senate": pd.to_numeric(df[columns["senate"]], errors="coerce"),
+    })
+    df = df.melt(id_vars=["RCDTS", "School District", "Total Students"], value_vars=CHAMBER_ORDER,
+                 var_name="Chamber", value_name="District Number")
+
+    # Schools without a legislative district can't be placed
+
+    return df.dropna(subset=["District Number"]).astype({"District Number": int})
+
+
+def read_roster(path=ROSTER_CSV):
+    """Legislator names by chamber and district number"""
+    roster = pd.read_csv(path, dtype={"District Number": int})
+    duplicated = roster.duplicated(["Chamber", "District Number"])
+    if duplicated.any():
+        rows = roster.loc[duplicated, ["Chamber", "District Number"]].to_string(index=False)
+        raise ValueError(f"{path} lists more than one legislator for:\n{rows}")
+    return roster[["Chamber", "District Number", "Legislator Name"]]
+
+
+# Crosswalk
+
+def build_crosswalk(schools, roster):
+    """Aggregate school enrollment to the legislative district crosswalk"""
+
+    # One name per school district (the most common spelling in the school file)
+
+    names = schools.groupby("RCDTS")["School District"].agg(lambda s: s.mode().iat[0])
+
+    df = schools.groupby(["Chamber", "District Number", "RCDTS"], as_index=False)["Total Students"].sum()
+    district_total = df.groupby(["Chamber", "RCDTS"])["Total Students"].transform("sum")
+    df["Share of Students"] = (df["Total Students"] / district_total.where(district_total > 0)).fillna(0).round(2)
+    df["Total Students"] = df["Total Students"].round().astype(int)
+    df["School District"] = df["RCDTS"].map(names)
+    df = df.merge(roster, on=["Chamber", "District Number"], how="left", validate="many_to_one")
+
+    df["Chamber"] = pd.Categorical(df["Chamber"], categories=CHAMBER_ORDER, ordered=True)
+    df = df.sort_values(["Chamber", "District Number", "School District"], ignore_index=True)
+    df["Chamber"] = df["Chamber"].astype(str)
+    return df[CROSSWALK_COLUMNS]
+
+
+# Build stage
+
+def _stamp_path(output):
+    return f"{os.path.splitext(output)[0]}.stamp.json"
+
+
+def _input_hash(paths, columns):
+    return f"{data_version(paths)}:{json.dumps(columns, sort_keys=True)}"
+
+
+def is_current(schools_path, roster_path, output=LEG_CSV, columns=SCHOOL_COLUMNS):
+    """True if the crosswalk was built from these inputs and hasn't been changed since"""
+    try:
+        with open(_stamp_path(output)) as f:
+            stamp = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    return (os.path.exists(output)
+            and stamp.get("inputs") == _input_hash([schools_path, roster_path], columns)
+            and stamp.get("output") == data_version([output]))
+
+
+def write_crosswalk(schools_path, roster_path=ROSTER_CSV, output=LEG_CSV, columns=SCHOOL_COLUMNS, force=False):
+    """Rebuild the crosswalk CSV if its inputs changed; return the crosswalk, or None if it was current"""
+    if not force and is_current(schools_path, roster_path, output, columns):
+        return None
+    df = build_crosswalk(read_schools(schools_path, columns), read_roster(roster_path))
+
+    # utf-8-sig matches the original spreadsheet export
+
+    df.to_csv(output, index=False, encoding="utf-8-sig", float_format="%g")
+    with open(_stamp_path(output), "w") as f:
+        json.dump({"inputs": _input_hash([schools_path, roster_path], columns), "output": data_version([output])}, f, indent=1)
+    return df
@@ -0,0 +1,242 @@
+# Data access for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Load the app data as memory-mapped Arrow tables and look up
+#           districts and legislative districts without copying the full data.
+#
+# NOTE on memory.
+#
+# peer_build.py writes uncompressed Arrow IPC (Feather v2) copies of
+# app_data_wide.parquet and leg_dist_coverage.csv. Opening them with
+# pa.memory_map means every app worker on the same machine reads the same
+# physical pages from the operating system's file cache instead of holding its
+# own copy. Only the rows a visitor asks for are converted to pandas.
+#
+# pandas is imported by the functions that read the parquet and CSV files,
+# not by this module, so the app can start without loading it (see
+# peer_profile.py).
+
+import os
+import tempfile
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+
+WIDE_PARQUET = "app_data_wide.parquet"
+LEG_CSV = "leg_dist_coverage.csv"
+WIDE_ARROW = "app_data_wide.arrow"
+LEG_ARROW = "leg_dist_coverage.arrow"
+
+STATE_RCDTS = "6500000008000"
+
+# ISBE county codes (characters 3-5 of the RCDTS) number Illinois' counties
+# alphabetically from 001 (Adams) to 102 (Woodford). Code 108 is used for the
+# university laboratory schools.
+
+ISBE_COUNTIES = [
+    "Adams", "Alexander", "Bond", "Boone", "Brown", "Bureau", "Calhoun", "Carroll", "Cass", "Champaign",
+    "Christian", "Clark", "Clay", "Clinton", "Coles", "Cook", "Crawford", "Cumberland", "DeKalb", "De Witt",
+    "Douglas", "DuPage", "Edgar", "Edwards", "Effingham", "Fayette", "Ford", "Franklin", "Fulton", "Gallatin",
+    "Greene", "Grundy", "Hamilton", "Hancock", "Hardin", "Henderson", "Henry", "Iroquois", "Jackson", "Jasper",
+    "Jefferson", "Jersey", "Jo Daviess", "Johnson", "Kane", "Kankakee", "Kendall", "Knox", "Lake", "LaSalle",
+    "Lawrence", "Lee", "Livingston", "Logan", "Macon", "Macoupin", "Madison", "Marion", "Marshall", "Mason",
+    "Massac", "McDonough", "McHenry", "McLean", "Menard", "Mercer", "Monroe", "Montgomery", "Morgan", "Moultrie",
+    "Ogle", "Peoria", "Perry", "Piatt", "Pike", "Pope", "Pulaski", "Putnam", "Randolph", "Richland",
+    "Rock Island", "St. Clair", "Saline", "Sangamon", "Schuyler", "Scott", "Shelby", "Stark", "Stephenson", "Tazewell",
+    "Union", "Vermilion", "Wabash", "Warren", "Washington", "Wayne", "White", "Whiteside", "Will", "Williamson",
+    "Winnebago", "Woodford",
+]
+
+
+# Build step
+
+def read_leg_csv(path=LEG_CSV):
+    """Read the legislative district crosswalk keeping RCDTS as text (it has leading zeros)"""
+    import pandas as pd
+
+    return pd.read_csv(path, dtype={"RCDTS": str})
+
+
+def write_arrow_files(wide_parquet=WIDE_PARQUET, leg_csv=LEG_CSV, wide_arrow=WIDE_ARROW, leg_arrow=LEG_ARROW):
+    """Write uncompressed Arrow IPC copies of the app data for memory-mapping"""
+    import pandas as pd
+
+    # Compression must stay off: compressed buffers have to be decompressed
+    # into private memory, which defeats memory-mapping.
+    #
+    # Running app processes have the old files memory-mapped. Rewriting a
+    # mapped file in place crashes them (SIGBUS), so each file is written to a
+    # temporary file and renamed over the old one: the old file stays on disk
+    # until its last mapping is closed.
+
+    for df, path in [(pd.read_parquet(wide_parquet), wide_arrow), (read_leg_csv(leg_csv), leg_arrow)]:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        os.close(fd)
+        try:
+            feather.write_feather(table, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return [wide_arrow, leg_arrow]
+
+
+# Loading
+
+def open_arrow_table(path):
+    """Memory-map an Arrow IPC file read-only and return it as a table (no copy)"""
+    source = pa.memory_map(path, "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def load_tables(wide_arrow=WIDE_ARROW, leg_arrow=LEG_ARROW):
+    """Return the wide data and legislative crosswalk as Arrow tables.
+
+    Falls back to reading the parquet and CSV files into memory when the
+    Arrow files have not been built.
+    """
+    if os.path.exists(wide_arrow):
+        table_wide = open_arrow_table(wide_arrow)
+    else:
+        import pandas as pd
+
+        table_wide = pa.Table.from_pandas(pd.read_parquet(WIDE_PARQUET), preserve_index=False)
+    if os.path.exists(leg_arrow):
+        table_leg = open_arrow_table(leg_arrow)
+    else:
+        table_leg = pa.Table.from_pandas(read_leg_csv(), preserve_index=False)
+    return table_wide, table_leg
+
+
+def served_files(wide_arrow=WIDE_ARROW, leg_arrow=LEG_ARROW):
+    """The files load_tables reads: the Arrow copies, or the parquet and CSV files before they are built"""
+    return [wide_arrow if os.path.exists(wide_arrow) else WIDE_PARQUET,
+            leg_arrow if os.path.exists(leg_arrow) else LEG_CSV]
+
+
+def file_stamp(path):
+    """Identity of a file, which changes when it is replaced or rewritten, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _file_stamps(paths):
+    return [(path, file_stamp(path)) for path in paths]
+
+
+_shared = {}
+
+
+def shared_tables():
+    """Tables from load_tables, mapped once per process and shared by every caller.
+
+    The files are opened again when they are replaced (see peer_refresh.py), so
+    a running app picks up new data without a restart.
+    """
+    stamps = _file_stamps(served_files())
+    if _shared.get("stamps") != stamps:
+        _shared["tables"] = load_tables()
+        _shared["stamps"] = stamps
+    return _shared["tables"]
+
+
+# School district lookups
+
+def district_names(table_wide):
+    """Unique district names in file order"""
+    return pc.unique(table_wide["District Name (IRC)"]).to_pylist()
+
+
+def filter_district(table_wide, district_name):
+    """Return the row for one district as a pandas data frame"""
+    mask = pc.equal(table_wide["District Name (IRC)"], district_name)
+    return table_wide.filter(mask).to_pandas()
+
+
+def district_name_for_rcdts(table_wide, rcdts):
+    """Return the district name for an RCDTS code, or None if it is not in the data"""
+    names = table_wide.filter(pc.equal(table_wide["RCDTS"], rcdts))["District Name (IRC)"]
+    return names[0].as_py() if len(names) else None
+
+
+def district_rcdts(school_rcdts):
+    """District RCDTS codes (13 characters) for a series of school RCDTS codes (15 characters)"""
+    rcdts = school_rcdts.astype(str).str.replace("-", "").str.strip().str.zfill(15)
+    return rcdts.str[:11] + "00"
+
+
+def county_label(rcdts):
+    """County name for a district RCDTS code"""
+    code = int(rcdts[2:5])
+    if 1 <= code <= len(ISBE_COUNTIES):
+        return f"{ISBE_COUNTIES[code - 1]} County"
+    if code == 108:
+        return "University Laboratory Schools"
+    return f"County code {rcdts[2:5]}"
+
+
+def county_groups(table_wide):
+    """District names grouped by county, excluding the State of Illinois row"""
+    groups = {}
+    for rcdts, name in zip(table_wide["RCDTS"].to_pylist(), table_wide["District Name (IRC)"].to_pylist()):
+        if rcdts != STATE_RCDTS:
+            groups.setdefault(county_label(rcdts), []).append(name)
+    return {county: sorted(groups[county]) for county in sorted(groups)}
+
+
+def select_columns(table_wide, columns):
+    """Return only the requested columns as a pandas data frame"""
+    return table_wide.select(columns).to_pandas()
+
+
+# Legislative district lookups
+
+def leg_chambers(table_leg):
+    """Sorted list of ILGA chambers"""
+    return sorted(pc.unique(table_leg["Chamber"]).to_pylist())
+
+
+def leg_district_numbers(table_leg, chamber):
+    """Sorted district numbers within a chamber"""
+    rows = table_leg.filter(pc.equal(table_leg["Chamber"], chamber))
+    return sorted(pc.unique(rows["District Number"]).to_pylist())
+
+
+def leg_legislators(table_leg):
+    """Sorted list of legislator names"""
+    return sorted(pc.unique(pc.drop_null(table_leg["Legislator Name"])).to_pylist())
+
+
+def filter_leg(table_leg, chamber=None, district_number=None, legislator=None):
+    """Return the crosswalk rows for a chamber and district number, or for a legislator"""
+    if legislator is not None:
+        mask = pc.equal(table_leg["Legislator Name"], legislator)
+    else:
+        mask = pc.and_(pc.equal(table_leg["Chamber"], chamber), pc.equal(table_leg["District Number"], district_number))
+    return table_leg.filter(mask)
+
+
+def leg_school_district_names(table_wide, leg_rows):
+    """Names of the school districts in a set of crosswalk rows"""
+    rows = table_wide.filter(pc.is_in(table_wide["RCDTS"], value_set=leg_rows["RCDTS"]))
+    return rows["District Name (IRC)"].to_pylist()
+
+
+def join_legislative(table_wide, leg_rows):
+    """Left join crosswalk rows to the wide data on RCDTS and return a pandas data frame.
+
+    Only the matching district rows are taken from the wide table.
+    """
+    positions = pc.index_in(leg_rows["RCDTS"], value_set=table_wide["RCDTS"])
+    matched = table_wide.drop_columns(["RCDTS"]).take(positions)
+    joined = leg_rows
+    for name in matched.column_names:
+        joined = joined.append_column(name, matched[name])
+    return joined.to_pandas()
@@ -0,0 +1,99 @@
+# Data downloads for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Build CSV and Excel downloads of the data behind each view, and
+#           the download buttons that serve them.
+#
+# NOTE on when files are built.
+#
+# Download buttons are given a function instead of file contents. Streamlit
+# only calls it when someone clicks, and calls it on a worker thread, so
+# building the statewide workbook never holds up the page for this or any
+# other visitor. Finished files are cached in memory and on disk by data
+# version and by district, legislative district, and format (see
+# peer_cache.py), so repeated clicks and other visitors get the same bytes
+# without rebuilding them.
+
+import functools
+import io
+import re
+
+import pandas as pd
+import streamlit as st
+
+from peer_cache import disk_cache
+from peer_data import shared_tables
+from peer_metrics import calculate_funding_metrics, legislative_tables
+
+
+EXPORT_FORMATS = {
+    "csv": ("CSV", "text/csv"),
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+LEGISLATIVE_SHEETS = ["School Districts", "Adequacy", "Positions", "Demographics", "Revenue"]
+
+
+# File contents
+
+def _to_bytes(sheets, fmt):
+    """Serialize {sheet name: data frame} as one workbook, or the first sheet as CSV"""
+    if fmt == "csv":
+        return next(iter(sheets.values())).to_csv(index=False).encode("utf-8")
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name[:31], index=False)
+    return buffer.getvalue()
+
+
+@st.cache_data
+@disk_cache
+def district_export(district_name, fmt):
+    """Long format metrics for one district (Excel adds demographics and revenue sheets)"""
+    _, _, _, df_merged, df_demographics, df_revenue, _, _ = calculate_funding_metrics(district_name)
+    df_metrics = df_merged.rename(columns={"District Name (IRC)": "District Name", "Adequate resources": "Adequate", "Gaps": "Surplus/Gap", "Gaps Per School": "Surplus/Gap Per School"})
+    return _to_bytes({"Metrics": df_metrics, "Demographics": df_demographics, "Revenue": df_revenue}, fmt)
+
+
+@st.cache_data
+@disk_cache
+def legislative_export(chamber, district_number, fmt):
+    """The five Legislative View tables (one sheet each, or joined on school district for CSV)"""
+    tables = legislative_tables(chamber, district_number)
+    if fmt == "csv":
+        # The tables share the same rows in the same order
+        df = pd.concat([tables[0]] + [table.drop(columns="School District") for table in tables[1:]], axis=1)
+        return _to_bytes({"Legislative District": df}, fmt)
+    return _to_bytes(dict(zip(LEGISLATIVE_SHEETS, tables)), fmt)
+
+
+@st.cache_data
+@disk_cache
+def statewide_export(fmt):
+    """Every district and column in the app data"""
+    table_wide, _ = shared_tables()
+    return _to_bytes({"Illinois Districts": table_wide.to_pandas()}, fmt)
+
+
+# Download buttons
+
+def _file_stem(*parts):
+    """Safe file name from district names and numbers"""
+    return "_".join(re.sub(r"[^A-Za-z0-9]+", "_", str(part)).strip("_") for part in parts)
+
+
+def download_buttons(export, args, file_stem, key):
+    """CSV and Excel download buttons whose files are built when clicked"""
+    columns = st.columns(len(EXPORT_FORMATS))
+    for column, (fmt, (label, mime)) in zip(columns, EXPORT_FORMATS.items()):
+        with column:
+            st.download_button(
+                f"Download {label}",
+                data=functools.partial(export, *args, fmt),
+                file_name=f"{_file_stem('peer', file_stem)}.{fmt}",
+                mime=mime,
+                on_click="ignore",
+                key=f"{key}_{fmt}",
+                icon=":material/download:",
+            )
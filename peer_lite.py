@@ -0,0 +1,168 @@
+# Lite mode for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  A low-bandwidth version of the app for older phones and limited
+#           data plans. Open the app with ?lite=1 (or ?lite=0 to turn it off);
+#           browsers with a data saver setting turn it on automatically by
+#           sending the "Save-Data: on" header.
+#
+# NOTE on what lite mode changes.
+#
+# The revenue and demographics charts are shown as small SVG images instead of
+# interactive plotly figures, and the comparison charts and statewide map are
+# left out, so the browser never downloads plotly.js. The page CSS, web fonts
+# and styled containers are skipped; headline numbers show as plain text.
+#
+# NOTE on rendering.
+#
+# The SVG charts are written here as text (a few kilobytes each) and cached in
+# memory and on disk like the plotly figures. `python peer_build.py lite`
+# renders every district in one pass and stores the results in the disk cache
+# (see peer_cache.py), so a lite page only reads a cached string.
+#
+# NOTE on imports.
+#
+# The app's first page uses the helpers here, so the data modules (and with
+# them pandas and pyarrow) are only imported by the chart functions.
+
+import html
+import math
+import textwrap
+
+import streamlit as st
+
+from peer_cache import cache_set_many, disk_cache
+
+
+LITE_PARAM = "lite"
+
+# plotly's Pastel palette, used by the full charts (px.colors.qualitative.Pastel)
+
+PASTEL = ["#66c5cc", "#f6cf71", "#f89c74", "#dcb0f2", "#87c55f", "#9eb9f3",
+          "#fe88b1", "#c9db74", "#8be0a4", "#b497e7", "#b3b3b3"]
+
+DEMOGRAPHIC_GROUPS = ["White", "Black", "Latine", "Asian", "Native Hawaiian or Other Pacific Islander",
+                      "American Indian or Alaska Native", "IEP", "EL", "Low Income"]
+
+REVENUE_SOURCES = ["Local Property Taxes", "Other Local Funding", "Evidence-Based Funding",
+                   "Other State Funding", "Federal Funding"]
+
+
+# Detecting lite mode
+
+def lite_mode():
+    """True if the visitor asked for lite mode or their browser asks to save data"""
+    value = st.query_params.get(LITE_PARAM)
+    if value is not None:
+        return value.lower() not in ("0", "false", "off")
+    return st.context.headers.get("Save-Data", "").lower() == "on"
+
+
+def lite_switch():
+    """Button that switches between the lite and full app"""
+    lite = lite_mode()
+    label = "Switch to the full version" if lite else "Slow connection? Switch to the lite version"
+    if st.button(label, type="tertiary", icon=":material/bolt:", key="lite_switch"):
+        st.query_params[LITE_PARAM] = "0" if lite else "1"
+        st.rerun()
+
+
+def styled_container(key, css_styles):
+    """A container styled with a CSS block (or a list of them), or a plain container in lite mode.
+
+    Streamlit gives a container with a key the class st-key-<key>, which the
+    styles are scoped to.
+    """
+    container = st.container(key=key)
+    if not lite_mode():
+        if isinstance(css_styles, str):
+            css_styles = [css_styles]
+        container.html("<style>" + "".join(f".st-key-{key} {css}" for css in css_styles) + "</style>")
+    return container
+
+
+def page_css(css):
+    """Add page CSS (skipped in lite mode)"""
+    if not lite_mode():
+        st.markdown(css, unsafe_allow_html=True)
+
+
+# SVG charts
+
+def bar_chart_svg(labels, values, title):
+    """Horizontal bar chart of shares (0-1) as SVG text. Missing values get no bar."""
+    width, label_width, row_height, font_size = 360, 150, 32, 11
+    bar_space = width - label_width - 48
+    finite = [v for v in values if v is not None and math.isfinite(v)]
+    scale = max(finite) * 1.3 if finite and max(finite) > 0 else 1.0
+    height = row_height * len(labels) + 8
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'font-family="Poppins, Arial, sans-serif" font-size="{font_size}" fill="#141554" role="img">',
+        f"<title>{html.escape(title)}</title>",
+    ]
+    for i, (label, value) in enumerate(zip(labels, values)):
+        middle = 4 + row_height * i + row_height / 2
+        lines = textwrap.wrap(label, 24)
+        first = middle - (len(lines) - 1) * (font_size + 1) / 2
+        spans = "".join(
+            f'<tspan x="{label_width - 6}" y="{first + j * (font_size + 1):.1f}">{html.escape(line)}</tspan>'
+            for j, line in enumerate(lines)
+        )
+        parts.append(f'<text text-anchor="end" dominant-baseline="middle">{spans}</text>')
+        if value is None or not math.isfinite(value):
+            continue
+        bar = max(value, 0) / scale * bar_space
+        parts.append(f'<rect x="{label_width}" y="{middle - 10:.1f}" width="{bar:.1f}" height="20" fill="{PASTEL[i % len(PASTEL)]}"/>')
+        parts.append(f'<text x="{label_width + bar + 4:.1f}" y="{middle:.1f}" dominant-baseline="middle">{value:.0%}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _revenue_svg(row):
+    """Revenue chart from a wide data row, largest source first like the full chart"""
+    values = [float(row[f"{source} (%)"]) for source in REVENUE_SOURCES]
+    order = sorted(range(len(values)), key=lambda i: -values[i] if math.isfinite(values[i]) else math.inf)
+    return bar_chart_svg([REVENUE_SOURCES[i] for i in order], [values[i] for i in order], "Revenue by source")
+
+
+def _demographics_svg(row):
+    """Demographics chart from a wide data row"""
+    values = [float(row[f"{group} (%)"]) for group in DEMOGRAPHIC_GROUPS]
+    return bar_chart_svg(DEMOGRAPHIC_GROUPS, values, "Student demographics")
+
+
+@st.cache_data
+@disk_cache
+def revenue_svg(district_name):
+    """Lite revenue chart for a district"""
+    from peer_metrics import process_filtered_data
+
+    return _revenue_svg(process_filtered_data(district_name).iloc[0])
+
+
+@st.cache_data
+@disk_cache
+def demographics_svg(district_name):
+    """Lite demographics chart for a district"""
+    from peer_metrics import process_filtered_data
+
+    return _demographics_svg(process_filtered_data(district_name).iloc[0])
+
+
+# Build step
+
+def prerender_lite_charts(district_names=None):
+    """Render the lite charts of every district (or the ones named) into the disk cache; return the number rendered"""
+    from peer_data import shared_tables, select_columns
+
+    table_wide, _ = shared_tables()
+    columns = [f"{col} (%)" for col in REVENUE_SOURCES + DEMOGRAPHIC_GROUPS]
+    df = select_columns(table_wide, ["District Name (IRC)"] + columns)
+    if district_names is not None:
+        df = df[df["District Name (IRC)"].isin(district_names)]
+    rows = [((row["District Name (IRC)"],), row) for _, row in df.iterrows()]
+    cache_set_many(revenue_svg.__qualname__, [(args, _revenue_svg(row)) for args, row in rows])
+    cache_set_many(demographics_svg.__qualname__, [(args, _demographics_svg(row)) for args, row in rows])
+    return len(rows)
@@ -0,0 +1,238 @@
+# Statewide choropleth maps for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Build pre-simplified district geometries (run once per data refresh
+#           through peer_build.py) and serve cached map figures to peer_app.py.
+#
+# NOTE on geometries.
+#
+# School district boundaries overlap in Illinois: elementary and high school
+# districts cover the same land, while unified districts cover both grades.
+# We therefore build two school district layers (unified + elementary and
+# unified + high school), each of which tiles the state without overlaps.
+# Each layer is simplified as a *coverage* so neighbouring districts keep a
+# shared border and no slivers or gaps appear between them.
+#
+# geopandas and shapely (>= 2.1) are only needed for the build step, not by
+# the app itself.
+
+import gzip
+import json
+import os
+
+import pandas as pd
+
+
+MAP_DIR = "map_data"
+
+# Map layers: (label shown in the app, kind of id stored on each feature)
+
+MAP_LAYERS = {
+    "elementary": ("School Districts (Unified & Elementary)", "RCDTS"),
+    "high_school": ("School Districts (Unified & High School)", "RCDTS"),
+    "house": ("House Districts", "District Number"),
+    "senate": ("Senate Districts", "District Number"),
+}
+
+# Simplification levels: (label, tolerance in degrees, coordinate decimals)
+# 0.01 degrees is roughly 1 km in Illinois.
+
+MAP_DETAIL_LEVELS = {
+    "state": ("Statewide", 0.01, 3),
+    "region": ("Regional", 0.003, 4),
+    "detail": ("Detailed", 0.0008, 5),
+}
+
+# Position gap columns in the wide data, keyed by the label used in the app
+
+POSITION_GAP_COLUMNS = {
+    "Core and Specialist Teachers": "Core and Specialist Teachers Gap (EIS)",
+    "Special Education Teachers": "Special Education Teachers Gap (EIS)",
+    "Counselors": "Counselors Gap (IRC)",
+    "Nurses": "Nurses Gap (IRC)",
+    "Psychologists": "Psychologists Gap (IRC)",
+    "Principals": "Principals Gap (EIS)",
+    "Assistant Principals": "Assistant Principals Gap (EIS)",
+    "EL Teachers": "EL Teachers Gap (EIS)",
+}
+
+# Columns of the wide data needed to compute map values
+
+MAP_VALUE_COLUMNS = [
+    "RCDTS",
+    "District Name (IRC)",
+    "Total ASE",
+    "Actual Resources",
+    "Adequacy Target",
+    "Adequacy Funding Gap",
+    "Adequacy Funding Gap Per Student",
+    "Adequacy Level",
+] + list(POSITION_GAP_COLUMNS.values())
+
+# Map metrics: (hover format, color midpoint)
+
+MAP_METRICS = {
+    "Adequacy Level": (":.0%", 1),
+    "Adequacy Funding Surplus/Gap Per Student": (":$,.0f", 0),
+}
+MAP_METRICS.update({f"{role} Surplus/Gap": (":,.1f", 0) for role in POSITION_GAP_COLUMNS})
+
+MAP_COLOR_SCALE = [[0, "#C4384D"], [0.5, "#f8f8ff"], [1, "#20a3bc"]]
+
+
+def map_file_path(layer, level, map_dir=MAP_DIR):
+    """Path of the simplified GeoJSON for a layer and detail level"""
+    return os.path.join(map_dir, f"{layer}_{level}.geojson.gz")
+
+
+# Build step
+
+def _round_coords(coords, decimals):
+    """Round nested GeoJSON coordinate lists to a fixed number of decimals"""
+    if isinstance(coords[0], (int, float)):
+        return [round(c, decimals) for c in coords]
+    return [_round_coords(c, decimals) for c in coords]
+
+
+def _read_boundaries(source_path, id_col, id_map=None):
+    """Read a boundary file into a GeoDataFrame with a string 'id' column in WGS84"""
+    import geopandas as gpd
+
+    gdf = gpd.read_file(source_path)[[id_col, "geometry"]].to_crs(4326)
+    gdf = gdf.rename(columns={id_col: "id"})
+    gdf["id"] = gdf["id"].astype(str)
+
+    # Optional crosswalk from the boundary file id (e.g. NCES ID) to RCDTS
+
+    if id_map is not None:
+        crosswalk = pd.read_csv(id_map, dtype=str)
+        crosswalk = dict(zip(crosswalk.iloc[:, 0], crosswalk.iloc[:, 1]))
+        gdf["id"] = gdf["id"].map(crosswalk)
+        gdf = gdf[gdf["id"].notna()]
+
+    return gdf
+
+
+def build_map_layer(layer, source_paths, id_col, id_map=None, map_dir=MAP_DIR):
+    """Simplify one map layer at every detail level and write it as gzipped GeoJSON.
+
+    All source files for a layer are combined into a single coverage before
+    simplifying so shared borders stay shared.
+    """
+    import shapely
+
+    gdf = pd.concat([_read_boundaries(path, id_col, id_map) for path in source_paths], ignore_index=True)
+
+    # Legislative district numbers are stored without leading zeros ("007" -> "7")
+
+    if MAP_LAYERS[layer][1] == "District Number":
+        gdf["id"] = gdf["id"].str.lstrip("0")
+
+    geoms = shapely.make_valid(gdf.geometry.values)
+
+    os.makedirs(map_dir, exist_ok=True)
+    written = []
+    for level, (_, tolerance, decimals) in MAP_DETAIL_LEVELS.items():
+        simplified = shapely.coverage_simplify(geoms, tolerance)
+        features = []
+        for feature_id, geom in zip(gdf["id"], simplified):
+            if geom is None or geom.is_empty:
+                continue
+            geometry = json.loads(shapely.to_geojson(geom))
+            geometry["coordinates"] = _round_coords(geometry["coordinates"], decimals)
+            features.append({"type": "Feature", "id": feature_id, "properties": {}, "geometry": geometry})
+        path = map_file_path(layer, level, map_dir)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f, separators=(",", ":"))
+        written.append(path)
+    return written
+
+
+# App side
+
+def load_map_geometry(layer, level, map_dir=MAP_DIR):
+    """Load a simplified GeoJSON layer, or None if it has not been built yet"""
+    path = map_file_path(layer, level, map_dir)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def map_metric_values(df, df_leg, layer, metric):
+    """Return a frame with 'id', 'Name' and the metric value for every feature of a layer.
+
+    Legislative districts are weighted by each school district's share of
+    students that live in the legislative district.
+    """
+    df = df[df["RCDTS"] != "6500000008000"]
+
+    if MAP_LAYERS[layer][1] == "RCDTS":
+        values = pd.DataFrame({"id": df["RCDTS"], "Name": df["District Name (IRC)"]})
+        if metric == "Adequacy Level":
+            values[metric] = df["Adequacy Level"]
+        elif metric == "Adequacy Funding Surplus/Gap Per Student":
+            values[metric] = df["Adequacy Funding Gap Per Student"] * -1
+        else:
+            values[metric] = df[POSITION_GAP_COLUMNS[metric.replace(" Surplus/Gap", "")]]
+        return values.reset_index(drop=True)
+
+    chamber = "House" if layer == "house" else "Senate"
+    leg = df_leg[df_leg["Chamber"] == chamber].merge(df, on="RCDTS", how="inner")
+    share = leg["Share of Students"]
+    weighted = pd.DataFrame({"District Number": leg["District Number"]})
+    if metric == "Adequacy Level":
+        weighted["numerator"] = leg["Actual Resources"] * share
+        weighted["denominator"] = leg["Adequacy Target"] * share
+    elif metric == "Adequacy Funding Surplus/Gap Per Student":
+        weighted["numerator"] = leg["Adequacy Funding Gap"] * share
+        weighted["denominator"] = leg["Total ASE"] * share
+    else:
+        weighted["numerator"] = leg[POSITION_GAP_COLUMNS[metric.replace(" Surplus/Gap", "")]] * share
+        weighted["denominator"] = 1
+    sums = weighted.groupby("District Number")[["numerator", "denominator"]].sum()
+    names = leg.groupby("District Number")["Legislator Name"].first()
+
+    values = pd.DataFrame({
+        "id": sums.index.astype(str),
+        "Name": [f"{chamber} District {n} ({names[n]})" for n in sums.index],
+        metric: (sums["numerator"] / sums["denominator"]).to_numpy(),
+    })
+    return values
+
+
+def _color_range(values, midpoint):
+    """Symmetric color range around the midpoint that ignores the most extreme 5% of districts"""
+    spread = (values.dropna() - midpoint).abs().quantile(0.95)
+    if not spread or pd.isna(spread):
+        spread = 1
+    return [midpoint - spread, midpoint + spread]
+
+
+def build_map_figure(geojson, values, metric):
+    """Build a choropleth figure for a metric frame from map_metric_values"""
+    import plotly.express as px
+
+    hover_format, midpoint = MAP_METRICS[metric]
+    fig = px.choropleth(
+        values,
+        geojson=geojson,
+        locations="id",
+        featureidkey="id",
+        color=metric,
+        hover_name="Name",
+        hover_data={"id": False, metric: hover_format},
+        color_continuous_scale=MAP_COLOR_SCALE,
+        color_continuous_midpoint=midpoint,
+        range_color=_color_range(values[metric], midpoint),
+    )
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_traces(marker_line_width=0.3, marker_line_color="white")
+    fig.update_layout(
+        height=650,
+        margin=dict(l=0, r=0, t=0, b=0),
+        paper_bgcolor="white",
+        font=dict(color="#141554"),
+        coloraxis_colorbar=dict(title=""),
+    )
+    return fig
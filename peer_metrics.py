@@ -0,0 +1,438 @@
+# District and legislative metrics for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Compute the numbers and tables shown in peer_app.py. These functions
+#           live outside the app so peer_warmup.py can fill the caches before
+#           the app starts serving visitors.
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import streamlit as st
+
+from peer_cache import disk_cache
+from peer_compensation import COMPENSATION_PARQUET, COMPENSATION_POSITIONS, compensation_matrix, funding_positions, gap_costs
+from peer_data import file_stamp, shared_tables, filter_district, filter_leg, join_legislative, select_columns
+from peer_schools import read_district_schools, SCHOOL_DEMOGRAPHICS, SCHOOL_PARQUET
+
+
+# Positions shown in the district comparison: label -> (adequate, actual, gap) columns
+
+RESOURCE_COLUMNS = {
+    "Core and Specialist Teachers": ("Adequate Core and Specialist Teachers", "Actual Core and Specialist Teachers Count (EIS)", "Core and Specialist Teachers Gap (EIS)"),
+    "Special Education Teachers": ("Adequate Special Education Teachers", "Actual Special Education Teachers Count (EIS)", "Special Education Teachers Gap (EIS)"),
+    "Counselors": ("Adequate Counselors", "Actual Counselors Count (IRC)", "Counselors Gap (IRC)"),
+    "Nurses": ("Adequate Nurses", "Actual Nurses Count (IRC)", "Nurses Gap (IRC)"),
+    "Psychologists": ("Adequate Psychologists", "Actual Psychologists Count (IRC)", "Psychologists Gap (IRC)"),
+    "Principals": ("Adequate Principals", "Actual Principals Count (EIS)", "Principals Gap (EIS)"),
+    "Assistant Principals": ("Adequate Assistant Principals", "Actual Assistant Principals Count (EIS)", "Assistant Principals Gap (EIS)"),
+    "EL Teachers": ("Adequate EL Teachers", "Actual EL Teachers (EIS)", "EL Teachers Gap (EIS)"),
+}
+
+
+# NOTE: Results are cached in memory (st.cache_data) and on disk (disk_cache).
+#       The disk cache is keyed by a hash of the data files, survives restarts
+#       and is shared by every app process using the same cache directory.
+
+@st.cache_data
+@disk_cache
+def process_filtered_data(district_name):
+    """Cache filtered data processing"""
+    table_wide, _ = shared_tables()
+    df_filtered = filter_district(table_wide, district_name)
+    return df_filtered
+
+# Melt data into long format for charts and drop down menus.
+
+@st.cache_data  
+@disk_cache
+def calculate_funding_metrics(district_name):
+
+    df_filtered = process_filtered_data(district_name)
+    
+    # EBF adequacy
+    
+    df_adequacy = pd.melt(
+        df_filtered,
+        id_vars=["RCDTS","District Name (IRC)","Total ASE"],
+        value_vars=[
+            "Adequacy Target",
+            "Adequacy Target Per Student",
+            "Adequate Core and Specialist Teachers",
+            "Adequate Special Education Teachers",
+            "Adequate Counselors",
+            "Adequate Nurses",
+            "Adequate Psychologists",
+            "Adequate Principals",
+            "Adequate Assistant Principals",
+            "Adequate EL Teachers"
+            ],
+            var_name="Resource",
+            value_name="Adequate resources"
+            )
+    df_adequacy["Resource"] = df_adequacy["Resource"].str.replace("Adequate ", "", regex=False)
+    df_adequacy["Resource"] = df_adequacy["Resource"].str.replace("Adequacy Target", "Total Resources (Dollar Amount)", regex=False)
+    df_adequacy["Resource"] = df_adequacy["Resource"].str.replace("Adequate Target Per Student", "Total Resources Per Student (Dollar Amount)", regex=False)
+    
+    # Actual resources 
+
+    df_actual = pd.melt(
+        df_filtered,
+        id_vars=["RCDTS", "Total ASE"],
+        value_vars=[
+            "Actual Resources",
+            "Actual Core and Specialist Teachers Count (EIS)",
+            "Actual Special Education Teachers Count (EIS)",
+            "Actual Counselors Count (IRC)",
+            "Actual Nurses Count (IRC)",
+            "Actual Psychologists Count (IRC)",
+            "Actual Principals Count (EIS)",
+            "Actual Assistant Principals Count (EIS)",
+            "Actual EL Teachers (EIS)"
+        ],
+        var_name="Resource",
+        value_name="Actual"
+        )
+    df_actual["Resource"] = df_actual["Resource"].str.replace("Actual ", "", regex=False)
+    df_actual["Resource"] = df_actual["Resource"].str.replace(" Count (EIS)", "", regex=False)
+    df_actual["Resource"] = df_actual["Resource"].str.replace(" (EIS)", "", regex=False)
+    df_actual["Resource"] = df_actual["Resource"].str.replace(" Count (IRC)", "", regex=False)
+    df_actual["Resource"] = df_actual["Resource"].str.replace("Resources", "Total Resources (Dollar Amount)", regex=False)
+    df_actual["Resource"] = df_actual["Resource"].str.replace("Resources Per Student", "Total Resources Per Student (Dollar Amount)", regex=False)
+    
+    # Adequacy gaps
+
+    df_gaps = pd.melt(
+        df_filtered,
+        id_vars=["RCDTS", "Total ASE"],
+        value_vars=[
+             "Adequacy Funding Gap",
+            "Adequacy Funding Gap Per Student",
+            "Core and Specialist Teachers Gap (EIS)",
+            "Special Education Teachers Gap (EIS)",
+            "Counselors Gap (IRC)",
+            "Nurses Gap (IRC)",
+            "Psychologists Gap (IRC)",
+            "Principals Gap (EIS)",
+            "Assistant Principals Gap (EIS)",
+            "EL Teachers Gap (EIS)"
+        ],
+        var_name="Resource",
+        value_name="Gaps"
+        )
+    df_gaps["Resource"] = df_gaps["Resource"].str.replace("Adequacy Funding Gap", "Total Resources (Dollar Amount)", regex=False)
+    df_gaps["Resource"] = df_gaps["Resource"].str.replace("Adequacy Funding Gap Per Student", "Total Resources Per Student (Dollar Amount)", regex=False)
+    df_gaps["Resource"] = df_gaps["Resource"].str.replace(" Gap (EIS)", "", regex=False)
+    df_gaps["Resource"] = df_gaps["Resource"].str.replace(" Gap (IRC)", "", regex=False)
+
+    illinois_negative_gap_sum = df_gaps["Gaps"].min()   
+
+    # Adequacy gaps per school
+
+    df_gaps_perschool = pd.melt(
+        df_filtered,
+        id_vars=["RCDTS", "Total ASE"],
+        value_vars=[
+             "Adequacy Funding Gap Per School",
+            "Core and Specialist Teachers Gap Per School",
+            "Special Education Teachers Gap Per School",
+            "Counselors Gap Per School",
+            "Nurses Gap Per School",
+            "Psychologists Gap Per School",
+            "Principals Gap Per School",
+            "Assistant Principals Gap Per School",
+            "EL Teachers Gap Per School"
+        ],
+        var_name="Resource",
+        value_name="Gaps Per School"
+        )
+    df_gaps_perschool["Resource"] = df_gaps_perschool["Resource"].str.replace(" Gap Per School", "", regex=False)
+
+
+    illinois_negative_gap_sum_perschool = df_gaps["Gaps"].min()     
+
+    # Merge adequacy and actuals
+
+    df_merged = pd.merge(
+        df_adequacy,
+        df_actual,
+        on=["RCDTS", "Resource", "Total ASE"],
+        how="left"
+    )
+
+    # Merge gaps
+
+    df_merged = pd.merge(
+        df_merged,
+        df_gaps,
+        on=["RCDTS", "Resource", "Total ASE"],
+        how="left"
+    )
+
+    # Merge gaps per school
+
+    df_merged = pd.merge(
+        df_merged,
+        df_gaps_perschool,
+        on=["RCDTS", "Resource", "Total ASE"],
+        how="left"
+    )
+
+    # Demographics melt
+
+    df_demographics = pd.melt(
+    df_filtered,
+    id_vars=["RCDTS", "District Name (IRC)", "Total ASE"],
+    value_vars=[
+        "White (%)", "Black (%)", "Latine (%)", "Asian (%)",
+        "Native Hawaiian or Other Pacific Islander (%)",
+        "American Indian or Alaska Native (%)","IEP (%)", "EL (%)", "Low Income (%)"
+    ],
+    var_name="Demographic Group",
+    value_name="Demographic Percentages"
+    )
+
+    # Demographics column name formatting
+
+    df_demographics["Demographic Group"] = df_demographics["Demographic Group"].str.replace(" (%)", "", regex=False)
+
+    # Revenue melt
+
+    df_revenue = pd.melt(
+        df_filtered,
+        id_vars=["RCDTS"],
+        value_vars=[
+             "Local Property Taxes (%)", "Other Local Funding (%)", 
+            "Evidence-Based Funding (%)", "Other State Funding (%)", 
+            "Federal Funding (%)"
+        ],
+        var_name="Revenue Source",
+        value_name="Revenue Percentages"
+        )
+    
+    # Revenue column name formatting
+
+    df_revenue["Revenue Source"] = df_revenue["Revenue Source"].str.replace(" (%)", "", regex=False)
+
+    # Resource filter formatting
+
+    resource_filter = "Total Resources (Dollar Amount)"
+    df_resource = df_merged[df_merged["Resource"] == resource_filter]
+    
+    # Get the actual and adequate resources variables
+    
+    actual_resources = df_resource["Actual"].iloc[0]
+    adequate_resources = df_resource["Adequate resources"].iloc[0]
+    ase = df_resource["Total ASE"].iloc[0]
+    
+    return actual_resources, adequate_resources, ase, df_merged, df_demographics, df_revenue, illinois_negative_gap_sum, illinois_negative_gap_sum_perschool
+
+
+# Legislative View tables
+
+@st.cache_data
+@disk_cache
+def legislative_tables(chamber, district_number):
+    """School districts, adequacy, positions, demographics and revenue tables for one legislative district"""
+    table_wide, table_leg = shared_tables()
+    df = join_legislative(table_wide, filter_leg(table_leg, chamber=chamber, district_number=district_number))
+
+    df_schools = df[['School District','Total Students','Share of Students']]
+
+    # The per student gap is stored positive for a gap; flip it so negative
+    # values are gaps, as in the total gap column
+
+    df_adequacy_stats = pd.DataFrame({
+        'School District': df['School District'],
+        'Adequacy Funding Surplus/Gap': df['Adequacy Funding Gap'],
+        'Adequacy Funding Surplus/Gap Per Student': df['Adequacy Funding Gap Per Student'] * -1,
+        'Adequacy Level': df['Adequacy Level'],
+    })
+
+    df_adequacy_pos = df[['School District','Core and Specialist Teachers Gap (EIS)',
+                          'Special Education Teachers Gap (EIS)', 
+                          'Counselors Gap (IRC)',
+                          'Nurses Gap (IRC)', 
+                          'Psychologists Gap (IRC)', 
+                          'Principals Gap (EIS)',
+                          'Assistant Principals Gap (EIS)', 
+                          'EL Teachers Gap (EIS)']]
+
+    df_adequacy_pos.columns = ['School District',
+                               'Core and Specialist Teachers',
+                               'Special Education Teachers', 
+                               'Counselors',
+                               'Nurses', 
+                               'Psychologists', 
+                               'Principals',
+                               'Assistant Principals', 
+                               'EL Teachers']
+
+    df_demo = df[['School District',
+                  'White (%)',
+                  'Black (%)',
+                  'Latine (%)',
+                  'Asian (%)',
+                  'Native Hawaiian or Other Pacific Islander (%)',
+                  'American Indian or Alaska Native (%)',
+                  'IEP (%)',
+                  'EL (%)',
+                  'Low Income (%)']]
+
+    df_demo.columns = ['School District',
+                  'White',
+                  'Black',
+                  'Latine',
+                  'Asian',
+                  'Native Hawaiian or Other Pacific Islander',
+                  'American Indian or Alaska Native',
+                  'IEP',
+                  'EL',
+                  'Low Income']
+
+    df_rev = df[['School District',
+                  'Local Property Taxes (%)', 
+                  'Other Local Funding (%)',
+                  'Evidence-Based Funding (%)', 
+                  'Other State Funding (%)',
+                  'Federal Funding (%)']]
+
+    df_rev.columns = ['School District',
+                  'Local Property Taxes', 
+                  'Other Local Funding',
+                  'Evidence-Based Funding', 
+                  'Other State Funding',
+                  'Federal Funding']
+
+    return df_schools, df_adequacy_stats, df_adequacy_pos, df_demo, df_rev
+
+
+# District comparison
+
+@st.cache_data
+@disk_cache
+def compare_districts(district_names):
+    """Adequacy and position metrics for several districts at once.
+
+    district_names is a tuple (sorted by the caller so the same set of
+    districts always hits the same cache entry). Every metric is computed as a
+    column operation over the selected rows rather than one district at a time.
+    Returns a summary frame (one row per district) and a long positions frame
+    (one row per district and position).
+    """
+    table_wide, _ = shared_tables()
+    position_columns = [col for cols in RESOURCE_COLUMNS.values() for col in cols]
+    rows = table_wide.filter(pc.is_in(table_wide["District Name (IRC)"], value_set=pa.array(district_names, pa.string())))
+    df = rows.select(["District Name (IRC)", "Total ASE", "Adequacy Target", "Actual Resources", "Adequacy Level"] + position_columns).to_pandas()
+    df = df.sort_values("District Name (IRC)", ignore_index=True)
+
+    # Funding totals and per student values (0 per student when ASE is 0, as in the School District View)
+
+    ase = df["Total ASE"].to_numpy(dtype=float)
+    target = df["Adequacy Target"].to_numpy(dtype=float)
+    actual = df["Actual Resources"].to_numpy(dtype=float)
+    gap = actual - target
+    safe_ase = np.where(ase > 0, ase, 1.0)
+
+    df_summary = pd.DataFrame({
+        "School District": df["District Name (IRC)"],
+        "Total ASE": ase,
+        "Adequacy Target": target,
+        "Actual Resources": actual,
+        "Adequacy Funding Surplus/Gap": gap,
+        "Adequacy Target Per Student": np.where(ase > 0, target / safe_ase, 0.0),
+        "Actual Resources Per Student": np.where(ase > 0, actual / safe_ase, 0.0),
+        "Adequacy Funding Surplus/Gap Per Student": np.where(ase > 0, gap / safe_ase, 0.0),
+        "Adequacy Level": df["Adequacy Level"].to_numpy(dtype=float),
+    })
+    for label, (_, _, gap_col) in RESOURCE_COLUMNS.items():
+        df_summary[label] = df[gap_col].to_numpy(dtype=float)
+
+    # Positions in long format: districts repeated once per position
+
+    labels = list(RESOURCE_COLUMNS)
+    adequate_cols, actual_cols, gap_cols = zip(*RESOURCE_COLUMNS.values())
+    df_positions = pd.DataFrame({
+        "School District": np.repeat(df["District Name (IRC)"].to_numpy(), len(labels)),
+        "Resource": np.tile(labels, len(df)),
+        "Adequate": df[list(adequate_cols)].to_numpy(dtype=float).ravel(),
+        "Actual": df[list(actual_cols)].to_numpy(dtype=float).ravel(),
+        "Gap": df[list(gap_cols)].to_numpy(dtype=float).ravel(),
+    })
+
+    return df_summary, df_positions
+
+
+# School drill-down
+
+# NOTE: Not disk cached: the data version (see peer_cache.py) covers only the
+#       Arrow copies of the app data, not app_data_schools.parquet, and
+#       reading one district's row groups from the school file is already
+#       quick. The memory cache is keyed on the school file's stamp as well, so
+#       rebuilding only that file is picked up on the next request.
+
+def district_schools(district_name):
+    """Schools in a district with their enrollment share of the district's gaps.
+
+    A school's share of a gap is the district gap times the school's share of
+    the district's enrollment. Returns None if the school file hasn't been
+    built, and an empty frame for the State of Illinois.
+    """
+    return _district_schools(district_name, file_stamp(SCHOOL_PARQUET))
+
+
+@st.cache_data(max_entries=256)
+def _district_schools(district_name, school_stamp):
+    """district_schools, cached by district and school file stamp"""
+    df_filtered = process_filtered_data(district_name)
+    df = read_district_schools(df_filtered["RCDTS"].iloc[0])
+    if df is None:
+        return None
+    share = df["Share of District Enrollment"].to_numpy(dtype=float)
+    funding_gap = float(df_filtered["Actual Resources"].iloc[0] - df_filtered["Adequacy Target"].iloc[0])
+    teacher_gap = float(df_filtered[RESOURCE_COLUMNS["Core and Specialist Teachers"][2]].iloc[0])
+    return pd.DataFrame({
+        "School": df["School Name"],
+        "Student Enrollment": df["Student Enrollment"],
+        "Share of District Enrollment": share,
+        "Adequacy Funding Surplus/Gap Share": share * funding_gap,
+        "Core and Specialist Teachers Gap Share": share * teacher_gap,
+        **{col.replace(" (%)", ""): df[col] for col in SCHOOL_DEMOGRAPHICS},
+    })
+
+
+# Staffing costs
+
+# NOTE: One small table per process (every district x five positions), shared
+#       by all sessions, so the expander only looks up its district. The
+#       compensation table isn't part of the data version, so the cache is
+#       keyed on its stamp and rebuilding only that file is picked up too.
+
+def staffing_costs():
+    """Compensation, cost of closing each position gap, and positions the funding gap would pay for, by RCDTS.
+
+    Returns None if the compensation table hasn't been built.
+    """
+    return _staffing_costs(file_stamp(COMPENSATION_PARQUET))
+
+
+@st.cache_resource(max_entries=1)
+def _staffing_costs(compensation_stamp):
+    """staffing_costs, cached by compensation file stamp"""
+    table_wide, _ = shared_tables()
+    gap_columns = [RESOURCE_COLUMNS[label][2] for label in COMPENSATION_POSITIONS]
+    df = select_columns(table_wide, ["RCDTS", "Adequacy Funding Gap"] + gap_columns).set_index("RCDTS")
+    matrix = compensation_matrix(df.index)
+    if matrix is None:
+        return None
+    gaps = df[gap_columns].set_axis(COMPENSATION_POSITIONS, axis=1)
+
+    # The State of Illinois funding gap is already the total shortfall of all districts
+
+    shortfall = (-df["Adequacy Funding Gap"]).clip(lower=0)
+    return {
+        "compensation": matrix,
+        "gap_costs": gap_costs(gaps, matrix),
+        "funding_gap_positions": funding_positions(shortfall, matrix),
+    }
@@ -0,0 +1,175 @@
+# Startup profile for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Measure how long the app takes to show its first page and to open
+#           each tab, and what it imports, against a startup budget. Exits
+#           with status 1 when the budget is exceeded, so CI shows startup
+#           regressions.
+#
+# Usage:
+#
+#   python peer_profile.py [--report startup_profile.json] [--scale 2]
+#
+# NOTE on what is measured.
+#
+# The profile runs in a new Python process with `-X importtime`, like a new
+# app server process, and an empty disk cache (see peer_cache.py), like the
+# first visitor after a data refresh. The app runs under streamlit's AppTest
+# (no browser or server): first the "Start Here!" page, then each tab opened
+# once in turn. App imports are the modules the app itself imports on top of
+# streamlit, which the server has loaded before the first visitor arrives.
+#
+# NOTE on the budget.
+#
+# Times depend on the machine, so the budget leaves room and --scale raises it
+# on slow CI runners. The first page must not import DEFERRED_MODULES at all;
+# that check doesn't depend on timing.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+APP = "peer_app.py"
+
+# Seconds. The first page and the first opening of each tab are measured
+# with an empty disk cache.
+
+BUDGET = {
+    "app_imports": 0.4,
+    "first_page": 1.0,
+    "tab": 1.5,
+}
+
+# Modules the first page must not import: the data modules load pandas and
+# pyarrow, the charts plotly.express. streamlit_extras is no longer used.
+
+DEFERRED_MODULES = ["pandas", "pyarrow", "plotly.express", "streamlit_extras"]
+
+TOP_IMPORTS = 10
+
+_START, _END = "peer_profile: first page start", "peer_profile: first page end"
+
+
+# Profiled process
+
+def _run_app():
+    """Run the app's first page and each tab; print the timings as JSON"""
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP, default_timeout=600)
+
+    # Markers around the first page delimit the app's imports in the -X importtime output
+
+    print(_START, file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    app.run()
+    first_page = time.perf_counter() - start
+    print(_END, file=sys.stderr, flush=True)
+
+    result = {
+        "first_page": first_page,
+        "deferred_loaded": [module for module in DEFERRED_MODULES if module in sys.modules],
+        "errors": [e.value for e in app.exception],
+        "tabs": {},
+    }
+    for tab in [tab.label for tab in app.tabs][1:]:
+        app.session_state["main_tab"] = tab
+        start = time.perf_counter()
+        app.run()
+        result["tabs"][tab] = time.perf_counter() - start
+        result["errors"] += [e.value for e in app.exception]
+    print(json.dumps(result))
+
+
+# Report
+
+def _app_imports(importtime_lines):
+    """Cumulative seconds of each import the app made itself, largest first"""
+    lines = importtime_lines[importtime_lines.index(_START) + 1:importtime_lines.index(_END)]
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            seconds = int(cumulative) / 1e6
+        except ValueError:
+            continue
+
+        # Nested imports are indented two spaces per level; keep the app's own imports
+
+        if len(name) - len(name.lstrip()) == 1:
+            imports.append((name.strip(), seconds))
+    return sorted(imports, key=lambda item: -item[1])
+
+
+def profile_startup(cache_dir=None):
+    """Profile the app in a new process and return the measurements as a dict"""
+    with tempfile.TemporaryDirectory() as empty_cache:
+        env = dict(os.environ, PEER_CACHE_DIR=cache_dir or empty_cache)
+        done = subprocess.run([sys.executable, "-X", "importtime", __file__, "--run-app"], capture_output=True,
+                              text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if done.returncode != 0:
+        raise RuntimeError(f"Profiling the app failed:\n{done.stderr[-2000:]}")
+    result = json.loads(done.stdout.strip().splitlines()[-1])
+    imports = _app_imports(done.stderr.splitlines())
+    result["app_imports"] = sum(seconds for _, seconds in imports)
+    result["top_imports"] = imports[:TOP_IMPORTS]
+    return result
+
+
+def check_budget(result, scale=1.0):
+    """Messages for every measurement over the budget (times scale) and every deferred module loaded"""
+    failures = [f"{name} took {result[name]:.2f}s (budget {BUDGET[name] * scale:.2f}s)"
+                for name in ("app_imports", "first_page") if result[name] > BUDGET[name] * scale]
+    failures += [f'Opening "{tab}" took {seconds:.2f}s (budget {BUDGET["tab"] * scale:.2f}s)'
+                 for tab, seconds in result["tabs"].items() if seconds > BUDGET["tab"] * scale]
+    failures += [f"The first page imported {module}" for module in result["deferred_loaded"]]
+    failures += [f"The app raised: {error}" for error in result["errors"]]
+    return failures
+
+
+def format_report(result):
+    """The measurements as text"""
+    lines = [f"{'App imports':<28}{result['app_imports']:>7.2f}s",
+             f"{'First page (Start Here!)':<28}{result['first_page']:>7.2f}s"]
+    lines += [f"{'Open ' + tab:<28}{seconds:>7.2f}s" for tab, seconds in result["tabs"].items()]
+    lines += ["", "Largest app imports:"]
+    lines += [f"  {name:<26}{seconds:>7.3f}s" for name, seconds in result["top_imports"]]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the PEER app's startup against the startup budget")
+    parser.add_argument("--report", help="Write the measurements to this JSON file")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the budget, e.g. 2 on a slow CI runner")
+    parser.add_argument("--cache-dir", help="Profile with this disk cache instead of an empty one")
+    parser.add_argument("--run-app", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_app:
+        _run_app()
+        return
+
+    result = profile_startup(args.cache_dir)
+    print(format_report(result))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(result, f, indent=1)
+
+    failures = check_budget(result, args.scale)
+    if failures:
+        print("\nOver the startup budget:\n" + "\n".join(f"  {failure}" for failure in failures))
+        sys.exit(1)
+    print("\nWithin the startup budget")
+
+
+if __name__ == "__main__":
+    main()
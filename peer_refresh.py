@@ -0,0 +1,191 @@
+# Data refresh for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Compare new app data with the previous version, report what
+#           changed, and rebuild only what the changes affect.
+#
+# Usage:
+#
+#   python peer_build.py refresh --previous app_data_wide.previous.parquet
+#                                [--previous-leg leg_dist_coverage.previous.csv]
+#                                [--threshold 0.05] [--report data_changes.csv]
+#
+# The data cleaning notebook keeps the previous app_data_wide.parquet as
+# app_data_wide.previous.parquet when it writes a new one. Leave out
+# --previous-leg if leg_dist_coverage.csv didn't change.
+#
+# NOTE on the change report.
+#
+# Rows are matched on RCDTS and every column is compared at once as arrays.
+# The report lists districts that were added or removed and every metric
+# whose relative change is larger than the threshold (5% by default).
+# Smaller changes aren't reported but still count as changes below.
+#
+# NOTE on what is rebuilt.
+#
+# Cached results (see peer_cache.py) belong to one data version, so new data
+# normally starts from an empty cache. Here results of the previous version
+# whose inputs didn't change at all are carried forward instead: district
+# results (metrics, charts, downloads, lite charts) if the district's row is
+# unchanged, legislative results if neither the legislative district's
+# crosswalk rows nor any of its school districts changed. Anything else,
+# including the statewide download, is recomputed when first needed. The
+# Arrow copies are rewritten and lite charts are rendered for the changed
+# districts only.
+#
+# A running app doesn't need a restart: its workers open the new Arrow copies
+# on the next request (peer_data.shared_tables) and drop in-memory results of
+# the previous version (peer_app.clear_stale_caches).
+
+import numpy as np
+import pandas as pd
+
+from peer_cache import carry_forward, clear_stale_versions, data_version
+from peer_data import WIDE_PARQUET, LEG_CSV, read_leg_csv, write_arrow_files
+
+
+DEFAULT_THRESHOLD = 0.05
+
+NAME_COLUMN = "District Name (IRC)"
+
+# Disk cached functions by what their arguments identify. Results of functions
+# not listed here are never carried forward.
+
+DISTRICT_RESULTS = {"process_filtered_data", "calculate_funding_metrics", "revenue_figure", "demographics_figure",
+                    "district_export", "revenue_svg", "demographics_svg"}
+LEGISLATIVE_RESULTS = {"legislative_tables", "legislative_export"}
+DISTRICT_SET_RESULTS = {"compare_districts"}
+
+
+# Comparing versions
+
+def _aligned(previous, current, key="RCDTS"):
+    """Rows of both versions for the districts in both, in the same order, and their shared columns"""
+    previous = previous.drop_duplicates(key).set_index(key)
+    current = current.drop_duplicates(key).set_index(key)
+    keys = current.index[current.index.isin(previous.index)]
+    columns = [col for col in current.columns if col in previous.columns]
+    return previous.loc[keys, columns], current.loc[keys, columns]
+
+
+def _numeric_columns(previous, current):
+    return [col for col in current.columns
+            if pd.api.types.is_numeric_dtype(current[col]) and pd.api.types.is_numeric_dtype(previous[col])]
+
+
+def changed_values(previous, current):
+    """Boolean frame (districts in both x shared columns), True where a value differs.
+
+    Missing values in both versions count as equal.
+    """
+    numeric = _numeric_columns(previous, current)
+    text = [col for col in current.columns if col not in numeric]
+    a, b = previous[numeric].to_numpy(dtype=float), current[numeric].to_numpy(dtype=float)
+    changed = pd.DataFrame(~((a == b) | (np.isnan(a) & np.isnan(b))), index=current.index, columns=numeric)
+    for col in text:
+        changed[col] = previous[col].astype(str).to_numpy() != current[col].astype(str).to_numpy()
+    return changed[list(current.columns)]
+
+
+def change_report(previous, current, threshold=DEFAULT_THRESHOLD, key="RCDTS"):
+    """One row per added or removed district and per metric that moved more than threshold"""
+    added = current[~current[key].isin(previous[key])]
+    removed = previous[~previous[key].isin(current[key])]
+    frames = [
+        pd.DataFrame({"RCDTS": added[key], "District Name": added[NAME_COLUMN], "Change": "Added district"}),
+        pd.DataFrame({"RCDTS": removed[key], "District Name": removed[NAME_COLUMN], "Change": "Removed district"}),
+    ]
+
+    prev, cur = _aligned(previous, current, key)
+    numeric = _numeric_columns(prev, cur)
+    a, b = prev[numeric].to_numpy(dtype=float), cur[numeric].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.abs(b - a) / np.abs(a)
+    relative[(a == b) | (np.isnan(a) & np.isnan(b))] = 0
+
+    # A value that appeared or disappeared always counts as a move
+
+    relative[np.isnan(a) != np.isnan(b)] = np.inf
+    rows, cols = np.nonzero(relative > threshold)
+    frames.append(pd.DataFrame({
+        "RCDTS": cur.index[rows],
+        "District Name": cur[NAME_COLUMN].to_numpy()[rows],
+        "Change": "Metric moved",
+        "Metric": np.array(numeric, dtype=object)[cols],
+        "Previous": a[rows, cols],
+        "Current": b[rows, cols],
+        "Relative Change": np.where(np.isfinite(relative[rows, cols]), (b[rows, cols] - a[rows, cols]) / np.abs(a[rows, cols]), np.nan),
+    }))
+    return pd.concat([f for f in frames if len(f)], ignore_index=True).reindex(
+        columns=["RCDTS", "District Name", "Change", "Metric", "Previous", "Current", "Relative Change"])
+
+
+def changed_districts(previous, current, key="RCDTS"):
+    """Names (previous and current) and RCDTS codes of districts that were added, removed or changed at all"""
+    if set(previous.columns) != set(current.columns):
+        # A column was added or removed: every district result may differ
+        return set(previous[NAME_COLUMN]) | set(current[NAME_COLUMN]), set(previous[key]) | set(current[key])
+    prev, cur = _aligned(previous, current, key)
+    row_changed = changed_values(prev, cur).any(axis=1).to_numpy()
+    codes = set(cur.index[row_changed]) | (set(previous[key]) ^ set(current[key]))
+    names = set(previous.loc[previous[key].isin(codes), NAME_COLUMN]) | set(current.loc[current[key].isin(codes), NAME_COLUMN])
+    return names, codes
+
+
+def changed_legislative(previous_leg, current_leg, district_codes):
+    """(chamber, district number) pairs whose crosswalk rows changed or that include a changed district"""
+    merged = previous_leg.merge(current_leg, how="outer", indicator=True)
+    keys = merged.loc[merged["_merge"] != "both", ["Chamber", "District Number"]]
+    both = pd.concat([previous_leg, current_leg])
+    keys = pd.concat([keys, both.loc[both["RCDTS"].isin(district_codes), ["Chamber", "District Number"]]])
+    return {(chamber, int(number)) for chamber, number in keys.itertuples(index=False)}
+
+
+def unchanged_result(district_names, legislative):
+    """keep() for peer_cache.carry_forward: True for results that don't depend on anything that changed"""
+    def keep(func_name, args):
+        if func_name in DISTRICT_RESULTS:
+            return args[0] not in district_names
+        if func_name in LEGISLATIVE_RESULTS:
+            return (args[0], int(args[1])) not in legislative
+        if func_name in DISTRICT_SET_RESULTS:
+            return district_names.isdisjoint(args[0])
+        return False
+    return keep
+
+
+# Build stage
+
+def refresh(previous_wide, previous_leg=LEG_CSV, threshold=DEFAULT_THRESHOLD, report_path=None):
+    """Report changes since the previous data and rebuild what they affect. Returns a summary dict."""
+    previous, current = pd.read_parquet(previous_wide), pd.read_parquet(WIDE_PARQUET)
+    previous_crosswalk, current_crosswalk = read_leg_csv(previous_leg), read_leg_csv(LEG_CSV)
+
+    report = change_report(previous, current, threshold)
+    if report_path:
+        report.to_csv(report_path, index=False)
+
+    names, codes = changed_districts(previous, current)
+    legislative = changed_legislative(previous_crosswalk, current_crosswalk, codes)
+
+    # The app serves the Arrow copies, which still hold the previous data, so
+    # their version is the one the previous results were cached under
+
+    old_version = data_version()
+    write_arrow_files()
+    kept, dropped = carry_forward(old_version, unchanged_result(names, legislative))
+    clear_stale_versions()
+
+    # Imported here so the report can be produced without streamlit
+
+    from peer_lite import prerender_lite_charts
+    rendered = prerender_lite_charts(sorted(set(current[NAME_COLUMN]) & names))
+
+    return {
+        "report": report,
+        "changed_districts": len(codes),
+        "changed_legislative": len(legislative),
+        "kept": kept,
+        "dropped": dropped,
+        "rendered": rendered,
+    }
@@ -0,0 +1,84 @@
+# School-level data for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Write the Illinois Report Card school rows to app_data_schools.parquet
+#           and read back the schools of one district for the School District
+#           View.
+#
+# NOTE on the file layout.
+#
+# Rows are sorted by district RCDTS and written in small row groups, and each
+# row group stores the smallest and largest district RCDTS it holds. Reading
+# one district with a filter skips every row group whose range can't contain
+# it, so a district's schools are read without loading the ~3,800 schools in
+# the state. Nothing is read until someone opens the schools drill-down.
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from peer_data import district_rcdts
+
+
+SCHOOL_PARQUET = "app_data_schools.parquet"
+
+# Large enough to keep the file footer small, small enough that a typical
+# district sits in one row group. Chicago's schools span several.
+
+ROW_GROUP_SIZE = 128
+
+SCHOOL_DEMOGRAPHICS = ["White (%)", "Black (%)", "Latine (%)", "Asian (%)",
+                       "Native Hawaiian or Other Pacific Islander (%)",
+                       "American Indian or Alaska Native (%)", "IEP (%)", "EL (%)", "Low Income (%)"]
+
+
+# Build step (called from the data cleaning notebook)
+
+def school_table(irc_schools):
+    """School rows of the IRC General sheet in app format.
+
+    Expects the notebook's irc_n rows with District Type "School", after
+    missing values and "*" were handled and columns converted to numbers.
+    """
+    enrollment = irc_schools["Student Enrollment (#)"].astype(float)
+    df = pd.DataFrame({
+        "District RCDTS": district_rcdts(irc_schools["RCDTS"]).to_numpy(),
+        "School RCDTS": irc_schools["RCDTS"].astype(str).str.replace("-", "").str.zfill(15).to_numpy(),
+        "School Name": irc_schools["School Name (IRC)"].astype(str).str.strip().to_numpy(),
+        "Student Enrollment": enrollment.to_numpy(),
+    })
+
+    # IRC percentages are 0-100; the app data stores shares
+
+    for col in SCHOOL_DEMOGRAPHICS:
+        df[col] = irc_schools[col].to_numpy(dtype=float) / 100
+
+    district_enrollment = df.groupby("District RCDTS")["Student Enrollment"].transform("sum")
+    df["Share of District Enrollment"] = df["Student Enrollment"] / district_enrollment.where(district_enrollment > 0)
+    return df.sort_values(["District RCDTS", "School Name"], ignore_index=True)
+
+
+def write_school_parquet(df_schools, path=SCHOOL_PARQUET):
+    """Write school rows sorted and row-grouped by district RCDTS"""
+    df_schools = df_schools.sort_values(["District RCDTS", "School Name"], ignore_index=True)
+    table = pa.Table.from_pandas(df_schools, preserve_index=False)
+    pq.write_table(
+        table,
+        path,
+        row_group_size=ROW_GROUP_SIZE,
+        write_statistics=["District RCDTS"],
+        sorting_columns=[pq.SortingColumn(table.column_names.index("District RCDTS"))],
+    )
+    return path
+
+
+# Reading
+
+def read_district_schools(rcdts, path=SCHOOL_PARQUET):
+    """The schools of one district (RCDTS), or None if the school file hasn't been built"""
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path, filters=[("District RCDTS", "==", rcdts)], memory_map=True)
+    return table.to_pandas()
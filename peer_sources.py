@@ -0,0 +1,374 @@
+# ISBE source workbooks for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Describe, in one place, which rows and columns the data cleaning
+#           notebook needs from each ISBE workbook, and read only those in a
+#           single streaming pass.
+#
+# NOTE on the schemas.
+#
+# Each source below names its sheet and its columns along with the name and
+# type each column gets in our data. There are two kinds of sheets:
+#
+# - EBF Full Calc sheets have title rows above the table and a state totals row
+#   at the bottom. The table starts after the row whose marker column reads
+#   "District Name" and ends at the row reading "TOTALS". Their column headings
+#   span several merged rows, so columns are picked by position.
+# - Report Card and EIS sheets have one heading row at the top, so columns are
+#   picked by heading.
+#
+# NOTE on column shifts.
+#
+# When ISBE inserts or renames a column the read stops with a SchemaError that
+# shows what changed, instead of quietly loading the wrong numbers:
+#
+# - Columns picked by heading must all be present, unless the schema lists them
+#   as optional. Missing headings are listed with the closest heading found in
+#   the sheet.
+# - For columns picked by position, the headings expected at those positions
+#   are kept in source_headers.lock.json, to be reviewed and committed with
+#   the code. Every read is compared against it, and a source missing from it
+#   fails like a changed one. Reading never writes the lock file. There is no
+#   lock file in the repository yet: create it, and later accept a change that
+#   is expected (e.g. a new fiscal year relabels a column), with
+#   `python peer_build.py sources ... --update-lock`, then review the lock
+#   file (`git diff` for a change) and commit it.
+# - Numeric columns that are mostly text are reported as well.
+
+import difflib
+import json
+import os
+
+import pandas as pd
+
+
+HEADER_LOCK = "source_headers.lock.json"
+
+
+class SchemaError(ValueError):
+    """An ISBE workbook does not match its schema"""
+
+
+# Schemas
+#
+# columns:  {position or heading: (column name, type)}. Types are "str",
+#           "float", or "raw" (values as read, for columns the notebook cleans
+#           itself).
+# sums:     {column name: [positions]} numeric columns added across (EBF only).
+# optional: [headings] columns that may be missing from the sheet; they are
+#           then left empty instead of failing the read (heading sheets only).
+
+EBF_MARKERS = dict(marker_col=1, header_marker="District Name", footer_marker="TOTALS")
+
+SOURCES = {
+    "ebf_core_investments": dict(
+        workbook="ebf",
+        sheet="Core Investments",
+        **EBF_MARKERS,
+        columns={
+            0: ("RCDTS", "str"),
+            1: ("District Name (EBF)", "str"),
+        },
+        sums={
+            "EBF Core Teachers Core Investments": [22, 23, 24],
+            "EBF Specialist Teachers Core Investments": [27],
+            "EBF Instructional Facilitators Core Investments": [30, 31, 32],
+            "EBF Core Intervention Teacher (Tutors) Core Investments": [35, 36, 37],
+            "EBF Core Investment Teacher Positions Core Investments": [40],
+            "EBF Special Population Teacher Positions Core Investments": [41],
+            "EBF Instructional Assistant Positions Core Investments": [42],
+            "EBF School Counselors Core Investments": [45, 46, 47],
+            "EBF School Nurses Core Investments": [50, 51, 52],
+            "EBF Supervisory Aides Core Investments": [55, 56, 57],
+            "EBF Librarians Core Investments": [60, 61, 62],
+            "EBF Librarian Aides Core Investments": [65, 66, 67],
+            "EBF Principals Core Investments": [70, 71, 72],
+            "EBF Assistant Principals Core Investments": [75, 76, 77],
+            "EBF School Site Staff Core Investments": [80, 81, 82],
+        },
+    ),
+    "ebf_base_calc": dict(
+        workbook="ebf",
+        sheet="Base Calc",
+        **EBF_MARKERS,
+        columns={
+            0: ("RCDTS", "str"),
+            3: ("EBF Base Calc Organization Type", "str"),
+            5: ("Total ASE", "float"),
+            13: ("EBF Base Calc Final Adequacy Target", "float"),
+            14: ("EBF Base Calc Final Adequacy Target Per Student", "float"),
+            18: ("EBF Base Calc Final Resources", "float"),
+            21: ("EBF Base Calc Adequacy Funding Gap", "float"),
+            22: ("EBF Base Calc Final Adequacy Level", "float"),
+        },
+    ),
+    "ebf_additional_investments": dict(
+        workbook="ebf",
+        sheet="Additional Investments",
+        **EBF_MARKERS,
+        columns={
+            0: ("RCDTS", "str"),
+            9: ("EBF Low Income Intervention Teacher Additional Investments", "float"),
+            12: ("EBF Low Income Pupil Support Staff Additional Investments", "float"),
+            15: ("EBF Low Income Extended Day Teacher Additional Investments", "float"),
+            18: ("EBF Low Income Summer School Teacher Additional Investments", "float"),
+            22: ("EBF English Learner Intervention Teacher Additional Investments", "float"),
+            25: ("EBF English Learner Pupil Support Staff Additional Investments", "float"),
+            28: ("EBF English Learner Extended Day Teacher Additional Investments", "float"),
+            31: ("EBF English Learner Summer School Teacher Additional Investments", "float"),
+            34: ("EBF Core Teacher Additional Investments", "float"),
+            38: ("EBF Special Ed Teacher Additional Investments", "float"),
+            41: ("EBF Special Ed Instructional Assistant Additional Investments", "float"),
+            44: ("EBF Special Ed School Psychologist Additional Investments", "float"),
+        },
+    ),
+    "irc_general": dict(
+        workbook="irc",
+        sheet="General",
+        columns={
+            "RCDTS": ("RCDTS", "str"),
+            "Level": ("District Type", "str"), # This was "Type" in SY24
+            "School Name": ("School Name (IRC)", "raw"),
+            "District": ("District Name (IRC)", "raw"),
+            "# Student Enrollment": ("Student Enrollment (#)", "raw"),
+            "% Student Enrollment - White": ("White (%)", "raw"),
+            "% Student Enrollment - Black or African American": ("Black (%)", "raw"),
+            "% Student Enrollment - Hispanic or Latino": ("Latine (%)", "raw"),
+            "% Student Enrollment - Asian": ("Asian (%)", "raw"),
+            "% Student Enrollment - Native Hawaiian or Other Pacific Islander": ("Native Hawaiian or Other Pacific Islander (%)", "raw"),
+            "% Student Enrollment - American Indian or Alaska Native": ("American Indian or Alaska Native (%)", "raw"),
+            "% Student Enrollment - Two or More Races": ("Two or more races (%)", "raw"),
+            "% Student Enrollment - Middle Eastern or North African": ("Middle Eastern or North African (%)", "raw"),
+            "% Student Enrollment - IEP": ("IEP (%)", "raw"),
+            "% Student Enrollment - EL": ("EL (%)", "raw"),
+            "% Student Enrollment - Low Income": ("Low Income (%)", "raw"),
+            "# Student Enrollment - White": ("White (#)", "raw"),
+            "# Student Enrollment - Black or African American": ("Black (#)", "raw"),
+            "# Student Enrollment - Hispanic or Latino": ("Latine (#)", "raw"),
+            "# Student Enrollment - Asian": ("Asian (#)", "raw"),
+            "# Student Enrollment - Native Hawaiian or Other Pacific Islander": ("Native Hawaiian or Other Pacific Islander (#)", "raw"),
+            "# Student Enrollment - American Indian or Alaska Native": ("American Indian or Alaska Native (#)", "raw"),
+            "# Student Enrollment - Two or More Races": ("Two or more races (#)", "raw"),
+            "# Student Enrollment - Middle Eastern or North African": ("Middle Eastern or North African (#)", "raw"),
+            "# Student Enrollment - IEP": ("IEP (#)", "raw"),
+            "# Student Enrollment - EL": ("EL (#)", "raw"),
+            "# Student Enrollment - Low Income": ("Low Income (#)", "raw"),
+            "Total Teacher FTE": ("IRC Teacher FTE", "raw"),
+            "School Counselor FTE": ("IRC School Counselor FTE", "raw"),
+            "School Nurse FTE": ("IRC School Nurse FTE", "raw"),
+            "School Psychologist FTE": ("IRC School Psychologist FTE", "raw"),
+            "School Social Worker FTE": ("IRC School Social Worker FTE", "raw"),
+        },
+    ),
+    "irc_finance": dict(
+        workbook="irc",
+        sheet="Finance",
+        columns={
+            "RCDTS": ("RCDTS", "str"),
+            "Level": ("District Type", "str"),
+            "% Local Property Taxes": ("Local Property Taxes (%)", "float"),
+            "% Other Local Funding": ("Other Local Funding (%)", "float"),
+            "% Evidence-Based Funding": ("Evidence-Based Funding (%)", "float"),
+            "% Other State Funding": ("Other State Funding (%)", "float"),
+            "% Federal Funding": ("Federal Funding (%)", "float"),
+        },
+    ),
+    "eis_positions": dict(
+        workbook="eis",
+        sheet="Sheet1",
+        columns={
+            "RCDTS": ("RCDTS", "str"),
+            "PositionCodeDescription": ("PositionCodeDescription", "str"),
+            "Salary": ("EIS Salary", "float"),
+            "Benefits": ("EIS Benefits", "float"),
+        },
+
+        # The compensation headings haven't been checked against an ATSB
+        # workbook yet. Without them the positions are still read, but the
+        # compensation table can't be written (see peer_compensation.py)
+
+        optional=["Salary", "Benefits"],
+    ),
+}
+
+
+# Reading
+
+def _text(value):
+    """Cell value as text, without the ".0" Excel adds to whole numbers"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _convert(values, dtype, source, name):
+    """Convert one extracted column to its schema type"""
+    if dtype == "str":
+        return pd.Series([_text(v) for v in values], dtype=object)
+    if dtype == "raw":
+        return pd.Series(values, dtype=object)
+
+    # Numeric columns that are mostly text usually mean ISBE moved a column
+
+    series = pd.Series(values, dtype=object)
+    numbers = pd.to_numeric(series, errors="coerce")
+    filled = series.notna() & (series.astype(str).str.strip() != "") & (series != "*")
+    if filled.sum() and numbers[filled].isna().mean() > 0.5:
+        examples = series[filled & numbers.isna()].astype(str).unique()[:3].tolist()
+        raise SchemaError(f"{source}: column '{name}' should be numeric but most values are text, e.g. {examples}")
+    return numbers
+
+
+def _check_headings(source, wanted, headings):
+    """Fail if any heading picked by name is missing from the sheet"""
+    found = [h for h in headings if h is not None]
+    missing = [h for h in wanted if h not in found]
+    if missing:
+
+        # Suggest only headings that no other wanted column already uses
+
+        unused = [h for h in found if h not in wanted]
+        lines = []
+        for heading in missing:
+            close = difflib.get_close_matches(heading, unused, n=1, cutoff=0.6)
+            lines.append(f"- {heading}" + (f"\n+ {close[0]}   (closest heading in the sheet)" if close else ""))
+        raise SchemaError(f"{source}: {len(missing)} heading(s) not found in sheet\n" + "\n".join(lines))
+
+
+def _read_rows(ws, spec, source):
+    """Stream a sheet once, returning (headings, rows) for the table it holds"""
+    if "header_marker" not in spec:
+        rows = ws.iter_rows(values_only=True)
+        headings = list(next(rows, ()))
+        return headings, rows
+
+    marker_col = spec["marker_col"]
+    positions = list(spec["columns"]) + [p for ps in spec.get("sums", {}).values() for p in ps]
+    max_col = max(positions + [marker_col]) + 1
+
+    # Skip title rows until the header marker, then yield rows through the footer
+
+    rows = ws.iter_rows(max_col=max_col, values_only=True)
+    for row in rows:
+        if len(row) > marker_col and row[marker_col] == spec["header_marker"]:
+            headings = list(row)
+            break
+    else:
+        raise SchemaError(f"{source}: header marker '{spec['header_marker']}' not found in column {marker_col + 1} of sheet '{spec['sheet']}'")
+
+    def table_rows():
+        for row in rows:
+            yield row
+            if len(row) > marker_col and row[marker_col] == spec["footer_marker"]:
+                return
+        raise SchemaError(f"{source}: footer marker '{spec['footer_marker']}' not found in column {marker_col + 1} of sheet '{spec['sheet']}'")
+
+    return headings, table_rows()
+
+
+def read_sheet(workbook, source, lock=None, update_lock=False):
+    """Read one source from an open openpyxl workbook into a data frame.
+
+    lock is the {source: {position: heading}} dictionary from the header lock
+    file. Positional headings are checked against it, or recorded in it with
+    update_lock=True. Pass lock=None to skip the check.
+    """
+    spec = SOURCES[source]
+    if spec["sheet"] not in workbook.sheetnames:
+        raise SchemaError(f"{source}: sheet '{spec['sheet']}' not found (sheets: {workbook.sheetnames})")
+    headings, rows = _read_rows(workbook[spec["sheet"]], spec, source)
+
+    # Resolve every wanted column to a position
+
+    sums = spec.get("sums", {})
+    if "header_marker" in spec:
+        positions = dict(spec["columns"])
+        pos_headings = {str(p): _text(headings[p]) if p < len(headings) else None for p in sorted(set(positions) | {p for ps in sums.values() for p in ps})}
+        if update_lock:
+            lock[source] = pos_headings
+        elif lock is not None:
+            _check_lock(source, pos_headings, lock)
+    else:
+        optional = spec.get("optional", [])
+        _check_headings(source, [h for h in spec["columns"] if h not in optional], headings)
+        positions = {headings.index(heading): name_type for heading, name_type in spec["columns"].items() if heading in headings}
+
+    # Project the wanted columns from each row
+
+    needed = sorted(set(positions) | {p for ps in sums.values() for p in ps})
+    values = {p: [] for p in needed}
+    for row in rows:
+        for p in needed:
+            values[p].append(row[p] if p < len(row) else None)
+
+    df = pd.DataFrame({name: _convert(values[p], dtype, source, name) for p, (name, dtype) in positions.items()})
+    for heading in spec.get("optional", []):
+        name, _ = spec["columns"][heading]
+        if name not in df:
+            df[name] = pd.Series(float("nan"), index=df.index)
+    for name, sum_positions in sums.items():
+        parts = [_convert(values[p], "float", source, f"{name} (column {p + 1})") for p in sum_positions]
+        df[name] = pd.concat(parts, axis=1).sum(axis=1)
+    return df
+
+
+# Header lock
+
+def load_lock(path=HEADER_LOCK):
+    """Saved positional headings by source, or {} if there is no lock file yet"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_lock(lock, path=HEADER_LOCK):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(lock, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _check_lock(source, pos_headings, lock):
+    """Compare positional headings with the lock"""
+    expected = lock.get(source)
+    if expected is None:
+        raise SchemaError(f"{source}: no saved column headings in the lock file. Check the headings in the workbook, "
+                          "record them with `python peer_build.py sources ... --update-lock`, and commit the lock file")
+    if expected != pos_headings:
+        def lines(headings):
+            return [f"column {int(p) + 1}: {h}" for p, h in sorted(headings.items(), key=lambda item: int(item[0]))]
+        diff = difflib.unified_diff(lines(expected), lines(pos_headings), fromfile=f"{source} (lock file)", tofile=f"{source} (workbook)", lineterm="")
+        raise SchemaError(f"{source}: column headings changed since the lock file was written\n" + "\n".join(diff))
+
+
+def read_sources(paths, sources=None, lock_path=HEADER_LOCK, update_lock=False):
+    """Read sources from ISBE workbooks, opening each workbook once.
+
+    paths maps a workbook ("ebf", "irc", "eis") to its file. Returns
+    {source: data frame}. Raises SchemaError on the first source that does not
+    match its schema or the lock file. With update_lock=True the positional
+    headings of the sources read are saved to the lock file instead of checked.
+    """
+
+    # Imported here so the app only loads openpyxl when it writes an Excel download
+
+    from openpyxl import load_workbook
+
+    sources = sources or [s for s in SOURCES if SOURCES[s]["workbook"] in paths]
+    lock = load_lock(lock_path)
+
+    frames = {}
+    for workbook_name in dict.fromkeys(SOURCES[s]["workbook"] for s in sources):
+        workbook = load_workbook(paths[workbook_name], read_only=True, data_only=True)
+        try:
+            for source in sources:
+                if SOURCES[source]["workbook"] == workbook_name:
+                    frames[source] = read_sheet(workbook, source, lock, update_lock)
+        finally:
+            workbook.close()
+
+    if update_lock:
+        save_lock(lock, lock_path)
+    return frames
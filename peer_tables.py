@@ -0,0 +1,109 @@
+# Table layer for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Declare how the columns of each table are displayed, once per
+#           table, and hand st.dataframe plain numeric Arrow tables.
+#
+# NOTE on formatting.
+#
+# pandas Styler turns every cell into a formatted string on the server and
+# sends the strings to the browser. Here the numbers stay numbers: the column
+# formats below are sent once with the table and applied by the browser, so
+# sorting a column sorts by value (not text) and large legislative districts
+# render without any per-cell work on the server.
+#
+# Formats use Streamlit's number formats. "percent" multiplies by 100 and
+# shows as many decimals as the step allows (step 0.01 -> "45%", step 0.001 ->
+# "45.3%").
+
+import functools
+
+import pyarrow as pa
+import streamlit as st
+
+from peer_metrics import legislative_tables, RESOURCE_COLUMNS
+
+
+# Column formats
+
+COLUMN_FORMATS = {
+    "currency": dict(format="$%,.0f"),
+    "count": dict(format="%,.0f"),
+    "fte": dict(format="%,.0f"),
+    "fte_1": dict(format="%,.1f"),
+    "percent": dict(format="percent", step=0.01),
+    "percent_1": dict(format="percent", step=0.001),
+}
+
+# Table schemas: table -> {column: format}. Columns not listed (district names)
+# are shown as they are.
+
+POSITION_COLUMNS = {label: "fte" for label in RESOURCE_COLUMNS}
+
+DEMOGRAPHIC_COLUMNS = ["White", "Black", "Latine", "Asian", "Native Hawaiian or Other Pacific Islander",
+                       "American Indian or Alaska Native", "IEP", "EL", "Low Income"]
+
+REVENUE_COLUMNS = ["Local Property Taxes", "Other Local Funding", "Evidence-Based Funding",
+                   "Other State Funding", "Federal Funding"]
+
+TABLE_SCHEMAS = {
+    "leg_schools": {
+        "Total Students": "count",
+        "Share of Students": "percent",
+    },
+    "leg_adequacy": {
+        "Adequacy Funding Surplus/Gap": "currency",
+        "Adequacy Funding Surplus/Gap Per Student": "currency",
+        "Adequacy Level": "percent",
+    },
+    "leg_positions": POSITION_COLUMNS,
+    "leg_demographics": {col: "percent_1" for col in DEMOGRAPHIC_COLUMNS},
+    "leg_revenue": {col: "percent_1" for col in REVENUE_COLUMNS},
+    "schools": {
+        "Student Enrollment": "count",
+        "Share of District Enrollment": "percent_1",
+        "Adequacy Funding Surplus/Gap Share": "currency",
+        "Core and Specialist Teachers Gap Share": "fte_1",
+        **{col: "percent_1" for col in DEMOGRAPHIC_COLUMNS},
+    },
+    "compare": {
+        "Total ASE": "count",
+        "Adequacy Target": "currency",
+        "Actual Resources": "currency",
+        "Adequacy Funding Surplus/Gap": "currency",
+        "Adequacy Target Per Student": "currency",
+        "Actual Resources Per Student": "currency",
+        "Adequacy Funding Surplus/Gap Per Student": "currency",
+        "Adequacy Level": "percent",
+        **POSITION_COLUMNS,
+    },
+}
+
+LEGISLATIVE_TABLES = ["leg_schools", "leg_adequacy", "leg_positions", "leg_demographics", "leg_revenue"]
+
+
+@functools.lru_cache(maxsize=None)
+def column_config(table_name):
+    """st.dataframe column_config for a table schema, built once per schema"""
+    return {
+        col: st.column_config.NumberColumn(alignment="center", **COLUMN_FORMATS[fmt])
+        for col, fmt in TABLE_SCHEMAS[table_name].items()
+    }
+
+
+def show_table(table, table_name):
+    """Display a table with its schema's column formats"""
+    st.dataframe(table, column_config=column_config(table_name), hide_index=True)
+
+
+# Legislative View tables
+
+# NOTE: cache_resource shares one read-only copy of each legislative district's
+#       Arrow tables between sessions; cache_data would copy them on every
+#       rerun. Each legislator represents exactly one district, so this is also
+#       the cache per legislator.
+
+@st.cache_resource(max_entries=200)
+def legislative_arrow_tables(chamber, district_number):
+    """The five Legislative View tables as Arrow tables, in LEGISLATIVE_TABLES order"""
+    return tuple(pa.Table.from_pandas(df, preserve_index=False) for df in legislative_tables(chamber, district_number))
@@ -0,0 +1,139 @@
+# Cache warm-up for the PEER Illinois Funding Tool
+# Authors: Chris D. Poulos (cdpoulos@gmail.com), Erykah Nava (EMAIL)
+
+# Purpose:  Record which districts and legislative districts visitors select,
+#           and fill the disk cache (peer_cache.py) with the most popular ones
+#           before the app starts serving visitors.
+#
+# Usage (run before starting the app, e.g. in the deploy start command):
+#
+#   python peer_warmup.py --districts 50 --legislative 30 && streamlit run peer_app.py
+#
+# NOTE on the selection log.
+#
+# The app appends one line per selection ("<unix time>\t<kind>\t<value>") to a
+# plain text file next to the disk cache. Short appends are safe from several
+# app processes at once. Only counts matter, so the log is trimmed to its most
+# recent lines during warm-up.
+#
+# Settings (environment variables):
+#
+# PEER_SELECTION_LOG  selection log file (default "<cache dir>/selections.log")
+
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+from peer_cache import CACHE_DIR
+
+
+SELECTION_LOG = os.environ.get("PEER_SELECTION_LOG", os.path.join(CACHE_DIR, "selections.log"))
+SELECTION_LOG_MAX_LINES = 200000
+
+
+# Selection log
+
+def log_selection(kind, value, path=None):
+    """Append a selection ("district" or "legislative") to the selection log"""
+    path = path or SELECTION_LOG
+    line = f"{int(time.time())}\t{kind}\t{value}\n"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:
+        # Logging is best effort and must never break the app
+        pass
+
+
+def legislative_key(chamber, district_number):
+    """Selection log value for a legislative district"""
+    return f"{chamber}|{district_number}"
+
+
+def top_selections(kind, n, path=None):
+    """Most frequently selected values of one kind, most popular first"""
+    path = path or SELECTION_LOG
+    counts = Counter()
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 3 and parts[1] == kind:
+                counts[parts[2]] += 1
+    return [value for value, _ in counts.most_common(n)]
+
+
+def compact_selection_log(max_lines=SELECTION_LOG_MAX_LINES, path=None):
+    """Keep only the most recent max_lines selections"""
+    path = path or SELECTION_LOG
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    if len(lines) <= max_lines:
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.writelines(lines[-max_lines:])
+    os.replace(tmp_path, path)
+
+
+# Warm-up
+
+def warm_caches(top_districts=50, top_legislative=30, path=None):
+    """Compute and cache results for the most popular selections.
+
+    Returns the number of districts and legislative districts warmed.
+    """
+
+    # Imported here so logging selections does not load the data or plotly
+
+    from peer_charts import revenue_figure, demographics_figure
+    from peer_data import shared_tables, district_names, leg_chambers, leg_district_numbers
+    from peer_metrics import calculate_funding_metrics, legislative_tables
+
+    compact_selection_log(path=path)
+
+    # Skip selections that are no longer in the data (e.g. renamed districts)
+
+    table_wide, table_leg = shared_tables()
+    known_districts = set(district_names(table_wide))
+    known_legislative = {legislative_key(chamber, number) for chamber in leg_chambers(table_leg) for number in leg_district_numbers(table_leg, chamber)}
+
+    districts = [d for d in top_selections("district", top_districts, path) if d in known_districts]
+    for district_name in districts:
+        calculate_funding_metrics(district_name)
+        revenue_figure(district_name)
+        demographics_figure(district_name)
+
+    legislative = [v for v in top_selections("legislative", top_legislative, path) if v in known_legislative]
+    for value in legislative:
+        chamber, district_number = value.split("|")
+        legislative_tables(chamber, int(district_number))
+
+    return len(districts), len(legislative)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the PEER app cache with the most popular selections")
+    parser.add_argument("--districts", type=int, default=50, help="Number of school districts to warm")
+    parser.add_argument("--legislative", type=int, default=30, help="Number of legislative districts to warm")
+    parser.add_argument("--log", default=SELECTION_LOG, help="Selection log file")
+    args = parser.parse_args(argv)
+
+    # The app's st.cache_data functions warn about running outside `streamlit run`
+
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+
+    start = time.perf_counter()
+    n_districts, n_legislative = warm_caches(args.districts, args.legislative, args.log)
+    print(f"Warmed {n_districts} school districts and {n_legislative} legislative districts in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
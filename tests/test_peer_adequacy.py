@@ -0,0 +1,176 @@
+# Hand-computed checks of peer_adequacy.py. The golden fixture (peer_adequacy.py
+# --check) rebuilds its inputs from the published data, so position_counts and
+# edge cases the published data doesn't have are checked here.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from peer_adequacy import IRC_TEACHERS, POSITIONS, adequacy_metrics, calculate_adequacy, position_counts
+from peer_data import STATE_RCDTS
+
+
+A, B, C, D = "0100100102600", "0100200102600", "0100300102600", "0100400102600"
+
+
+def source_row(**values):
+    """EBF, IRC and EIS source columns of one district, 0 unless given"""
+    cols = [col for p in POSITIONS for col in p[1] + p[3]] + [IRC_TEACHERS[1]]
+    row = dict.fromkeys(cols, 0.0)
+    row.update(values)
+    return row
+
+
+def district(rcdts, ase, schools, resources, target, ebf_gap, **positions):
+    """Funding inputs and adequate/actual position counts of one district, 0 positions unless given"""
+    row = {
+        "RCDTS": rcdts,
+        "Total ASE": ase,
+        "School Count": schools,
+        "EBF Base Calc Final Resources": resources,
+        "EBF Base Calc Final Adequacy Target": target,
+        "EBF Base Calc Final Adequacy Target Per Student": target / ase if ase else np.nan,
+        "EBF Base Calc Adequacy Funding Gap": ebf_gap,
+    }
+    row.update({col: 0.0 for p in POSITIONS for col in (p[0], p[2])})
+    row.update(positions)
+    return row
+
+
+@pytest.fixture
+def metrics():
+    """A short district, a district with a surplus and no students, one without a school
+    count, one without EBF data, and the State of Illinois row"""
+    rows = [
+        district(A, 100, 2, 900_000, 1_000_000, 100_000,
+                 **{"Adequate Principals": 3, "Actual Principals Count (EIS)": 2,
+                    "Adequate Core and Specialist Teachers": 10, "Actual Core and Specialist Teachers Count (EIS)": np.nan,
+                    "Adequate Special Education Teachers": 4, "Actual Special Education Teachers Count (EIS)": np.nan}),
+        district(B, 0, 1, 500_000, 400_000, -100_000,
+                 **{"Adequate Principals": 1, "Actual Principals Count (EIS)": 2,
+                    "Adequate Core and Specialist Teachers": 5, "Actual Core and Specialist Teachers Count (EIS)": 3}),
+        district(C, 50, np.nan, 300_000, 330_000, 30_000,
+                 **{"Adequate Principals": 2, "Actual Principals Count (EIS)": 0}),
+        district(D, 80, 1, np.nan, 700_000, np.nan),
+        district(STATE_RCDTS, 150, 0, 1_700_000, 1_730_000, 30_000),
+    ]
+    return adequacy_metrics(pd.DataFrame(rows), irc_teachers=False).set_index("RCDTS")
+
+
+# Position counts
+
+def test_position_counts_add_inputs():
+    df = pd.DataFrame([source_row(**{
+        "EBF Core Teachers Core Investments": 10,
+        "EBF Core Teacher Additional Investments": 2,
+        "EBF Specialist Teachers Core Investments": 3,
+        "EBF Low Income Extended Day Teacher Additional Investments": 1,
+        "EBF Low Income Summer School Teacher Additional Investments": 0.5,
+        "EIS Teacher": 12,
+        "EIS Career and Technical Educator (CTE)": 1,
+        "EBF English Learner Intervention Teacher Additional Investments": 1.25,
+        "EBF English Learner Extended Day Teacher Additional Investments": 0.5,
+        "EBF English Learner Summer School Teacher Additional Investments": 0.25,
+        "EIS English as a Second Language Teacher": 1,
+        "EBF School Nurses Core Investments": 0.8,
+        "IRC School Nurse FTE": "1.5",
+        "IRC Teacher FTE": 20,
+    })])
+    counts = position_counts(df).iloc[0]
+    assert counts["Adequate Core and Specialist Teachers"] == pytest.approx(16.5)
+    assert counts["Actual Core and Specialist Teachers Count (EIS)"] == 13
+    assert counts["Adequate EL Teachers"] == pytest.approx(2.0)
+    assert counts["Actual EL Teachers (EIS)"] == 1
+    assert counts["Adequate Nurses"] == pytest.approx(0.8)
+    assert counts["Actual Nurses Count (IRC)"] == 1.5
+    assert counts["Actual Core and Specialist Teachers Count (IRC)"] == 20
+    assert counts["Adequate Principals"] == 0
+
+
+def test_position_counts_missing_input():
+    df = pd.DataFrame([source_row(**{"EIS Teacher": 12, "EIS Career and Technical Educator (CTE)": np.nan,
+                                     "EBF Principals Core Investments": "*"})])
+    counts = position_counts(df).iloc[0]
+    assert np.isnan(counts["Actual Core and Specialist Teachers Count (EIS)"])
+    assert np.isnan(counts["Adequate Principals"])
+
+
+def test_calculate_adequacy_from_sources():
+    funding = district(A, 100, 2, 900_000, 1_000_000, 100_000)
+    funding = {col: funding[col] for col in ["RCDTS", "Total ASE", "School Count", "EBF Base Calc Final Resources",
+                                             "EBF Base Calc Final Adequacy Target",
+                                             "EBF Base Calc Final Adequacy Target Per Student",
+                                             "EBF Base Calc Adequacy Funding Gap"]}
+    df = pd.DataFrame([{**funding, **source_row(**{"EBF Principals Core Investments": 3, "EIS Principal": 2,
+                                                   "EBF Core Teachers Core Investments": 10,
+                                                   "EBF Special Ed Teacher Additional Investments": 4,
+                                                   "IRC Teacher FTE": 11})}])
+    row = calculate_adequacy(df).iloc[0]
+    assert row["Principals Gap (EIS)"] == -1
+    assert row["Principals Gap Per School"] == -0.5
+
+    # The IRC teacher count is compared with core and special education teachers together
+
+    assert row["Core and Specialist Teachers Gap (IRC)"] == 11 - (10 + 4)
+
+
+# Funding
+
+def test_funding_gap_signs(metrics):
+    short, surplus = metrics.loc[A], metrics.loc[B]
+
+    # The published gap is actual minus target: negative is a shortfall
+
+    assert short["Adequacy Funding Gap"] == -100_000
+    assert surplus["Adequacy Funding Gap"] == 100_000
+    assert short["Adequacy Funding Gap Per School"] == -50_000
+
+    # The gap per student is EBF's own gap: positive is a shortfall
+
+    assert short["Adequacy Funding Gap Per Student"] == 1_000
+    assert short["Adequacy Level"] == pytest.approx(0.9)
+    assert surplus["Adequacy Level"] == pytest.approx(1.25)
+    assert short["Actual Resources Per Student"] == 9_000
+
+
+def test_zero_ase_is_missing(metrics):
+    surplus = metrics.loc[B]
+    assert np.isnan(surplus["Adequacy Funding Gap Per Student"])
+    assert np.isnan(surplus["Actual Resources Per Student"])
+
+
+def test_districts_without_gaps_are_dropped(metrics):
+    assert list(metrics.index) == [A, B, STATE_RCDTS]
+
+
+# Positions
+
+def test_position_gap_signs(metrics):
+    assert metrics.loc[A, "Principals Gap (EIS)"] == -1
+    assert metrics.loc[A, "Principals Gap Per School"] == -0.5
+    assert metrics.loc[B, "Principals Gap (EIS)"] == 1
+    assert metrics.loc[B, "Core and Specialist Teachers Gap (EIS)"] == -2
+
+
+def test_missing_position_gaps(metrics):
+
+    # Missing core teacher counts count as 0; other missing counts stay missing
+
+    assert metrics.loc[A, "Core and Specialist Teachers Gap (EIS)"] == 0
+    assert np.isnan(metrics.loc[A, "Special Education Teachers Gap (EIS)"])
+
+
+# State of Illinois
+
+def test_state_row_sums_shortfalls(metrics):
+    state = metrics.loc[STATE_RCDTS]
+
+    # The funding gap counts every district with a gap, including C (no school
+    # count); per school and position gaps count only the districts kept
+
+    assert state["Adequacy Funding Gap"] == -100_000 - 30_000
+    assert state["Adequacy Funding Gap Per School"] == -50_000
+    assert state["Principals Gap (EIS)"] == -1
+    assert state["Core and Specialist Teachers Gap (EIS)"] == -2
+    assert state["Principals Gap Per School"] == -np.inf
+    assert state["Adequacy Funding Gap Per Student"] == 200